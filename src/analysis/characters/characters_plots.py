@@ -5,14 +5,6 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 from src.utils.constants import *
 
-COLD_WAR_PERIODS = {
-    'Blocs Establishment': (1947, 1953),
-    'Major tensions and crises': (1954, 1962),
-    'Détente': (1963, 1974),
-    'Second Cold War': (1975, 1984),
-    'End of the Cold War': (1985, 1991)
-}
-
 def plot_eastern_western_archetypes_distrib(east_df, west_df, east_colors, west_colors):
     eastern_movie_eastern_char = east_df[east_df["movie_side"] == 'Eastern']
     western_movie_eastern_char = east_df[east_df["movie_side"] == 'Western']
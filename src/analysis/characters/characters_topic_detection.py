@@ -10,10 +10,11 @@ from nltk.corpus import stopwords
 nltk.download('stopwords')
 
 import spacy
-from gensim import corpora
-from gensim.models.ldamodel import LdaModel
 from collections import Counter
 
+from src.utils.text_normalization import TextNormalizer
+from src.utils.topic_models import TopicModelRegistry
+
 VOC_MAPPING = {
     'anti-': 'anti',
     'anti ': 'anti',
@@ -80,7 +81,7 @@ def preprocess_char_repres(string_list, nlp, words_to_remove):
 
     Parameters:
     - string_list: the list of character representations
-    - nlp: the spacy nlp model
+    - nlp: a `TextNormalizer`, or the spacy nlp model used without cache
     - words_to_remove: the list of words to remove from the character representations
 
     Returns:
@@ -89,13 +90,10 @@ def preprocess_char_repres(string_list, nlp, words_to_remove):
     # personalize the stop words
     stop_words = set(stopwords.words('english')).union(words_to_remove)
 
-    docs = [nlp(s) for s in string_list]
-    tokens = []
-    for doc in docs:
-        tokens.extend([token.lemma_ for token in doc if not token.is_punct and token.lemma_ not in stop_words])
-    return tokens
+    normalizer = nlp if isinstance(nlp, TextNormalizer) else TextNormalizer(nlp, cache_path=None)
+    return [lemma for lemma, _, is_punct in normalizer.tokens(string_list) if not is_punct and lemma not in stop_words]
 
-def topic_detection(df, nb_topics, nb_passes):
+def topic_detection(df, nb_topics, nb_passes, registry=None, seed=42):
     """
     Detect topics in the character representations
 
@@ -103,16 +101,17 @@ def topic_detection(df, nb_topics, nb_passes):
     - df: the dataframe containing the character representations
     - nb_topics: the number of topics to detect
     - nb_passes: the number of passes for the LDA model
+    - registry: the `TopicModelRegistry` of the trained models, the default one if None
+    - seed: the random state of the LDA model
 
     Returns:
-    - lda_model: the trained LDA model
+    - lda_model: the trained LDA model, loaded from the registry if it was already trained
     - corpus: the corpus used to train the LDA model
     - dictionary: the dictionary used to train the LDA model
     """
-    dictionary = corpora.Dictionary(df)
-    corpus = [dictionary.doc2bow(text) for text in df]
-    
-    lda_model = LdaModel(corpus, num_topics=nb_topics, id2word=dictionary, passes=nb_passes)
+    if registry is None:
+        registry = TopicModelRegistry()
+    lda_model, corpus, dictionary = registry.get(df, nb_topics, nb_passes, seed)
     
     for idx, topic in lda_model.print_topics(-1, 10):
         print(f'Topic: {idx}\nWords: {topic}\n')
@@ -138,7 +137,11 @@ def get_dominant_topic(lda_model, corpus):
     return topics
 
 def get_main_character_archetypes(df, nb_topics, nb_passes, nlp, words_to_remove):
-    df['processed_repres'] = df['character_representation'].apply(preprocess_char_repres, args=(nlp, words_to_remove))
+    # Lemmatize each distinct attribute once, with the persisted cache unless a `TextNormalizer` is given
+    normalizer = nlp if isinstance(nlp, TextNormalizer) else TextNormalizer(nlp)
+    normalizer.analyze_column(df['character_representation'])
+    normalizer.save()
+    df['processed_repres'] = df['character_representation'].apply(preprocess_char_repres, args=(normalizer, words_to_remove))
     topic_detection_res = topic_detection(df['processed_repres'], nb_topics, nb_passes)
     df['topic'] = get_dominant_topic(topic_detection_res[0], topic_detection_res[1])
     # Keep only the "relevant" dominant topics that is the characters for which the
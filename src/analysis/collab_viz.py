@@ -1,68 +1,119 @@
 import dash
-import copy
+from copy import deepcopy
+from types import MappingProxyType
+from functools import lru_cache
 from dash import Dash, dcc, html, Input, Output
 import plotly.graph_objects as go
 import networkx as nx
 from src.utils.collab_viz_helpers import *
+from src.utils.graph_layout import LayoutEngine
 from src.utils.constants import *
 
+# Number of slider positions whose figure is kept by the Dash apps
+FIGURE_CACHE_SIZE = 256
 
-class StaticGraph:
 
-    def __init__(self, movies_df, min_nb_movies=0, min_nb_collab=0, relevance_nb=10, relevance_diff=10, threshold=19):
-        # Compute a dict where each movies is associated to the root of the number
-        # of film it has produced, and the dict where each unique tuple of countries is associated
-        # with the number of co-production they had
-        self.countries, self.root_film_count, self.collaboration_count = compute_counts(movies_df, min_nb_movies, min_nb_collab)
+class CollaborationAccessors:
+    """
+    Read-only accessors shared by `StaticGraph` and `StaticMap`.
 
-        # Compute a dict of the countries associated to their Cold War Side
-        self.country_cold_war_side = assign_side(movies_df, self.countries, relevance_nb, relevance_diff, threshold)
+    The getters return views on the data of the graph (tuples, `MappingProxyType`, networkx views)
+    without copying them, a copy is only made when asked with `copy=True`. The figure is the
+    exception: it cannot be made read-only and may be shared through the figure caches of the Dash
+    apps, so `get_figure` returns a copy unless `copy=False` is given by a caller that does not
+    modify it.
+    """
 
-        # Create the graph
-        self.graph = nx.Graph()
-        for country in self.countries:
-            self.graph.add_node(country, side=self.country_cold_war_side[country], size=self.root_film_count[country])
-        for (c1, c2), count in self.collaboration_count.items():
-            self.graph.add_edge(c1, c2, weight=count)
+    def plot(self):
+        return self.get_figure(copy=False).show()
 
-    def create_figure(self):
-        # Will be usefull to adjust thickness and transparency
-        max_collaboration = max(self.collaboration_count.values())
+    def get_figure(self, copy=True):
+        if not hasattr(self, 'fig'):
+            raise RuntimeError("The figure has not been created yet, call `create_figure` first.")
+        return deepcopy(self.fig) if copy else self.fig
 
-        # Generate spring layout
-        pos = nx.spring_layout(self.graph, seed=42, weight="weight", k=10, iterations=100)
+    def get_countries(self, copy=False):
+        return list(self.countries) if copy else tuple(self.countries)
 
-        # Prepare edge traces with varying colors, widths, and transparency
-        edge_traces = []
+    def get_root_film_count(self, copy=False):
+        return dict(self.root_film_count) if copy else MappingProxyType(self.root_film_count)
 
-        for edge in self.graph.edges(data=True):
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            weight = edge[2]['weight']
-            
-            # Get the Cold War Side of the two nodes involved in the edge
-            side_0 = self.graph.nodes[edge[0]]['side']
-            side_1 = self.graph.nodes[edge[1]]['side']
-            
-            # Determine the edge color based on the Cold War Sides
-            if side_0 == side_1:
-                if side_0 == 'Western':
-                    line_color = f'rgba({COLOR_SCALE_RGB["Deep Blue"][0]}, {COLOR_SCALE_RGB["Deep Blue"][1]}, {COLOR_SCALE_RGB["Deep Blue"][2]}, {(weight / max_collaboration) * 5})'
-                elif side_0 == 'Eastern':
-                    line_color = f'rgba({COLOR_SCALE_RGB["Deep Red"][0]}, {COLOR_SCALE_RGB["Deep Red"][1]}, {COLOR_SCALE_RGB["Deep Red"][2]}, {(weight / max_collaboration) * 5})'
-                else:
-                    line_color = f'rgba({NEUTRAL_COLORS_RGB["Neutral Light"][0]}, {NEUTRAL_COLORS_RGB["Neutral Light"][1]}, {NEUTRAL_COLORS_RGB["Neutral Light"][2]}, 1)'
-            else:
-                line_color = f'rgba({NEUTRAL_COLORS_RGB["Neutral Light"][0]}, {NEUTRAL_COLORS_RGB["Neutral Light"][1]}, {NEUTRAL_COLORS_RGB["Neutral Light"][2]}, 1)'
-            
-            edge_trace = go.Scatter(
-                x=[x0, x1, None],
-                y=[y0, y1, None],
-                line=dict(width=weight * 0.01, color=line_color),
+    def get_collaboration_count(self, copy=False):
+        return dict(self.collaboration_count) if copy else MappingProxyType(self.collaboration_count)
+
+    def get_country_cold_war_side(self, copy=False):
+        return dict(self.country_cold_war_side) if copy else MappingProxyType(self.country_cold_war_side)
+
+    def get_nodes(self, copy=False):
+        return deepcopy(self.graph.nodes) if copy else self.graph.nodes
+
+    def get_edges(self, copy=False):
+        return deepcopy(self.graph.edges) if copy else self.graph.edges
+
+
+class StaticGraph(CollaborationAccessors):
+
+    def __init__(self, movies_df, min_nb_movies=0, min_nb_collab=0, relevance_nb=10, relevance_diff=10, threshold=19, side_counts=None, coproduction=None):
+        # Compute a dict where each movies is associated to the root of the number
+        # of film it has produced, and the dict where each unique tuple of countries is associated
+        # with the number of co-production they had. `coproduction` can be precomputed with
+        # `build_coproduction_matrix` to share the sparse matrix between several graphs
+        if coproduction is None:
+            coproduction = build_coproduction_matrix(movies_df)
+        self.coproduction = coproduction
+        self.countries, self.root_film_count, self.collaboration_count = compute_counts(movies_df, min_nb_movies, min_nb_collab, coproduction)
+
+        # Compute a dict of the countries associated to their Cold War Side, `side_counts` can be
+        # precomputed with `compute_side_counts` to share it between several graphs
+        self.country_cold_war_side = assign_side(movies_df, self.countries, relevance_nb, relevance_diff, threshold, side_counts)
+
+        # Create the graph
+        self.graph = build_graph(self.countries, self.root_film_count, self.collaboration_count, self.country_cold_war_side)
+
+    @classmethod
+    def from_index(cls, index, min_nb_movies=0, min_nb_collab=0):
+        """
+        Build the graph of the given thresholds from a `CollaborationIndex`, without going through the movies again.
+        """
+        graph = cls.__new__(cls)
+        graph.coproduction = index.coproduction
+        graph.countries, graph.root_film_count, graph.collaboration_count = index.counts(min_nb_movies, min_nb_collab)
+        graph.country_cold_war_side = index.cold_war_side(graph.countries)
+        graph.graph = build_graph(graph.countries, graph.root_film_count, graph.collaboration_count, graph.country_cold_war_side)
+        return graph
+
+    def create_figure(self, pos=None, batched=True, nb_width_bins=20, max_edges=None):
+        # Will be usefull to adjust thickness and transparency
+        max_collaboration = max(self.collaboration_count.values(), default=1)
+
+        # Generate spring layout, unless positions are given (e.g. by a `LayoutEngine` shared
+        # between the views of the same graph)
+        if pos is None:
+            pos = nx.spring_layout(self.graph, seed=42, weight="weight", k=10, iterations=100)
+
+        neutral_color = f'rgba({NEUTRAL_COLORS_RGB["Neutral Light"][0]}, {NEUTRAL_COLORS_RGB["Neutral Light"][1]}, {NEUTRAL_COLORS_RGB["Neutral Light"][2]}, 1)'
+        edges = list(self.graph.edges(data='weight'))
+        starts = [pos[c1] for c1, _, _ in edges]
+        ends = [pos[c2] for _, c2, _ in edges]
+        weights = [weight for _, _, weight in edges]
+        # Get the Cold War Side shared by the two nodes involved in the edge, if any
+        sides = [get_shared_side(self.graph.nodes[c1]['side'], self.graph.nodes[c2]['side']) for c1, c2, _ in edges]
+
+        # Prepare edge traces with varying colors, widths, and transparency. In batched mode, the
+        # edges of the same color and of close weights are drawn by a single trace (see
+        # `bucket_edges`), otherwise each edge has its own trace
+        buckets = bucket_edges(starts, ends, weights, sides, nb_width_bins if batched else None, max_edges)
+
+        edge_traces = [
+            go.Scatter(
+                x=xs,
+                y=ys,
+                line=dict(width=weight * 0.01, color=get_edge_color(side, weight, max_collaboration, neutral_color)),
                 hoverinfo='none',
                 mode='lines'
             )
-            edge_traces.append(edge_trace)
+            for side, weight, xs, ys in buckets
+        ]
 
         # Add all edge traces to the figure
         self.fig = go.Figure(data=edge_traces)
@@ -104,41 +155,26 @@ class StaticGraph:
 
         # Set the layout
         self.fig.update_layout(layout)
-        return copy.deepcopy(self.fig)
-    
-    def plot(self):
-        if hasattr(self, 'fig'):
-            return self.fig.show()
-        else:
-            raise("Error: The Figure have not been created yet.")
-        
-    def get_figure(self):
-        if hasattr(self, 'fig'):
-            return copy.deepcopy(self.fig)
-        else:
-            raise("Error: The Figure have not been created yet.")
-
-    def get_countries(self):
-        return copy.deepcopy(self.countries)
-    
-    def get_root_film_count(self):
-        return copy.deepcopy(self.root_film_count)
-    
-    def get_collaboration_count(self):
-        return copy.deepcopy(self.collaboration_count)
-    
-    def get_country_cold_war_side(self):
-        return copy.deepcopy(self.country_cold_war_side)
-    
-    def get_nodes(self):
-        return copy.deepcopy(self.graph.nodes)
-    
-    def get_edges(self):
-        return copy.deepcopy(self.graph.edges)
+        return self.fig
 
 
 class DynamicGraph:
-    def __init__(self, movies_df):
+    def __init__(self, movies_df, layout_method="spring", layout_iterations=0):
+        # `layout_method` computes the global layout with networkx ("spring") or NumPy ("numpy"),
+        # `layout_iterations` refines the positions of each view starting from the global ones
+        # The full graph is computed once, each slider position only filters it. The figures of the
+        # last positions are kept in a LRU cache
+        index = CollaborationIndex(movies_df)
+
+        # One layout of the full graph, cached to disk, reused by every view so the countries
+        # keep their place when the sliders move
+        layout_engine = LayoutEngine(StaticGraph.from_index(index).graph, method=layout_method)
+
+        @lru_cache(maxsize=FIGURE_CACHE_SIZE)
+        def render(min_films, min_collab):
+            graph = StaticGraph.from_index(index, min_nb_movies=min_films, min_nb_collab=min_collab)
+            return graph.create_figure(pos=layout_engine.layout(graph.graph, iterations=layout_iterations))
+
         self.app = Dash(__name__)
 
         self.app.layout = html.Div([
@@ -174,86 +210,71 @@ class DynamicGraph:
             Input('min-collaborations-slider', 'value')
         )
         def update_map(min_films, min_collab):
-            graph = StaticGraph(movies_df, min_nb_movies=min_films, min_nb_collab=min_collab)
-            return graph.create_figure()
+            return render(min_films, min_collab)
         
     def get_app(self):
-        return copy.deepcopy(self.app)
+        return self.app
     
     def plot(self):
         return self.app.run(debug=True)
 
 
-class StaticMap:
+class StaticMap(CollaborationAccessors):
 
-    def __init__(self, movies_df, min_nb_movies=0, min_nb_collab=0, relevance_nb=10, relevance_diff=10, threshold=19):
+    def __init__(self, movies_df, min_nb_movies=0, min_nb_collab=0, relevance_nb=10, relevance_diff=10, threshold=19, side_counts=None, coproduction=None):
         # Compute a dict where each movies is associated to the root of the number
         # of film it has produced, and the dict where each unique tuple of countries is associated
-        # with the number of co-production they had
-        self.countries, self.root_film_count, self.collaboration_count = compute_counts(movies_df, min_nb_movies, min_nb_collab)
-
-        # Compute a dict of the countries associated to their Cold War Side
-        self.country_cold_war_side = assign_side(movies_df, self.countries, relevance_nb, relevance_diff, threshold)
+        # with the number of co-production they had. `coproduction` can be precomputed with
+        # `build_coproduction_matrix` to share the sparse matrix between several graphs
+        if coproduction is None:
+            coproduction = build_coproduction_matrix(movies_df)
+        self.coproduction = coproduction
+        self.countries, self.root_film_count, self.collaboration_count = compute_counts(movies_df, min_nb_movies, min_nb_collab, coproduction)
+
+        # Compute a dict of the countries associated to their Cold War Side, `side_counts` can be
+        # precomputed with `compute_side_counts` to share it between several graphs
+        self.country_cold_war_side = assign_side(movies_df, self.countries, relevance_nb, relevance_diff, threshold, side_counts)
         
         # Create the graph
-        self.graph = nx.Graph()
-        for country in self.countries:
-            self.graph.add_node(country, side=self.country_cold_war_side[country], size=self.root_film_count[country])
-        for (c1, c2), count in self.collaboration_count.items():
-            self.graph.add_edge(c1, c2, weight=count)
-
-    def get_countries(self):
-        return self.countries
-    
-    def get_root_film_count(self):
-        return self.root_film_count
-    
-    def get_collaboration_count(self):
-        return self.collaboration_count
-    
-    def get_country_cold_war_side(self):
-        return self.country_cold_war_side
-    
-    def get_nodes(self):
-        return self.graph.nodes
-    
-    def get_edges(self):
-        return self.graph.edges
-    
-    def create_figure(self):
+        self.graph = build_graph(self.countries, self.root_film_count, self.collaboration_count, self.country_cold_war_side)
+
+    @classmethod
+    def from_index(cls, index, min_nb_movies=0, min_nb_collab=0):
+        """
+        Build the graph of the given thresholds from a `CollaborationIndex`, without going through the movies again.
+        """
+        graph = cls.__new__(cls)
+        graph.coproduction = index.coproduction
+        graph.countries, graph.root_film_count, graph.collaboration_count = index.counts(min_nb_movies, min_nb_collab)
+        graph.country_cold_war_side = index.cold_war_side(graph.countries)
+        graph.graph = build_graph(graph.countries, graph.root_film_count, graph.collaboration_count, graph.country_cold_war_side)
+        return graph
+
+    def create_figure(self, batched=True, nb_width_bins=20, max_edges=None):
         # Will be usefull to adjust thickness and transparency
-        max_collaboration = max(self.collaboration_count.values())
-
-        # Prepare edge traces with varying colors and widths
-        edge_lat, edge_lon, edge_colors, edge_widths = [], [], [], []
-
-        for (c1, c2), weight in self.collaboration_count.items():
-            if c1 in COUNTRY_COORDS and c2 in COUNTRY_COORDS:
-                # Coordinates for edges
-                edge_lat.extend([COUNTRY_COORDS[c1][0], COUNTRY_COORDS[c2][0], None])
-                edge_lon.extend([COUNTRY_COORDS[c1][1], COUNTRY_COORDS[c2][1], None])
+        max_collaboration = max(self.collaboration_count.values(), default=1)
 
-                # Determine color based on the Cold War Side side
-                if self.country_cold_war_side.get(c1) == 'Western' and self.country_cold_war_side.get(c2) == 'Western':
-                    edge_colors.append(f'rgba({COLOR_SCALE_RGB["Deep Blue"][0]}, {COLOR_SCALE_RGB["Deep Blue"][1]}, {COLOR_SCALE_RGB["Deep Blue"][2]}, {(weight / max_collaboration) * 5})')
-                elif self.country_cold_war_side.get(c1) == 'Eastern' and self.country_cold_war_side.get(c2) == 'Eastern':
-                    edge_colors.append(f'rgba({COLOR_SCALE_RGB["Deep Red"][0]}, {COLOR_SCALE_RGB["Deep Red"][1]}, {COLOR_SCALE_RGB["Deep Red"][2]}, {(weight / max_collaboration) * 5})')
-                else:
-                    edge_colors.append(COLOR_MAPPING['None'])
+        # Coordinates (lon, lat) of the edges, and the Cold War Side shared by their countries if any
+        edges = [(c1, c2, weight) for (c1, c2), weight in self.collaboration_count.items() if c1 in COUNTRY_COORDS and c2 in COUNTRY_COORDS]
+        starts = [COUNTRY_COORDS[c1][::-1] for c1, _, _ in edges]
+        ends = [COUNTRY_COORDS[c2][::-1] for _, c2, _ in edges]
+        weights = [weight for _, _, weight in edges]
+        sides = [get_shared_side(self.country_cold_war_side.get(c1), self.country_cold_war_side.get(c2)) for c1, c2, _ in edges]
 
-                # Determine edge thickness
-                edge_widths.append((weight / max_collaboration) * 5)
+        # In batched mode, the edges of the same color and of close weights are drawn by a single
+        # trace (see `bucket_edges`), otherwise each edge has its own trace
+        buckets = bucket_edges(starts, ends, weights, sides, nb_width_bins if batched else None, max_edges)
 
         self.fig = go.Figure()
 
         # Add all edge traces to the figure
-        for i, (start_lat, start_lon, color, width) in enumerate(zip(edge_lat[::3], edge_lon[::3], edge_colors, edge_widths)):
+        for side, weight, lons, lats in buckets:
             self.fig.add_trace(go.Scattergeo(
                 locationmode='ISO-3',
-                lat=[edge_lat[i*3], edge_lat[i*3+1], None],
-                lon=[edge_lon[i*3], edge_lon[i*3+1], None],
+                lat=lats,
+                lon=lons,
                 mode='lines',
-                line=dict(width=width, color=color),
+                line=dict(width=(weight / max_collaboration) * 5, color=get_edge_color(side, weight, max_collaboration, COLOR_MAPPING['None'])),
                 hoverinfo='none'
             ))
 
@@ -293,42 +314,20 @@ class StaticMap:
             )
         )
 
-        return copy.deepcopy(self.fig)
+        return self.fig
 
-    def plot(self):
-        if hasattr(self, 'fig'):
-            return self.fig.show()
-        else:
-            raise("Error: The Figure have not been created yet.")
-        
-    def get_figure(self):
-        if hasattr(self, 'fig'):
-            return copy.deepcopy(self.fig)
-        else:
-            raise("Error: The Figure have not been created yet.")
-
-    def get_countries(self):
-        return copy.deepcopy(self.countries)
-    
-    def get_root_film_count(self):
-        return copy.deepcopy(self.root_film_count)
-    
-    def get_collaboration_count(self):
-        return copy.deepcopy(self.collaboration_count)
-    
-    def get_country_cold_war_side(self):
-        return copy.deepcopy(self.country_cold_war_side)
-    
-    def get_nodes(self):
-        return copy.deepcopy(self.graph.nodes)
-    
-    def get_edges(self):
-        return copy.deepcopy(self.graph.edges)
-    
 
 class DynamicMap:
 
     def __init__(self, movies_df):
+        # The full graph is computed once, each slider position only filters it. The figures of the
+        # last positions are kept in a LRU cache
+        index = CollaborationIndex(movies_df)
+
+        @lru_cache(maxsize=FIGURE_CACHE_SIZE)
+        def render(min_films, min_collab):
+            return StaticMap.from_index(index, min_nb_movies=min_films, min_nb_collab=min_collab).create_figure()
+
         self.app = dash.Dash(__name__)
 
         self.app.layout = html.Div([
@@ -369,11 +368,75 @@ class DynamicMap:
             ]
         )
         def update_map(min_films, min_collab):
-            map = StaticMap(movies_df, min_nb_movies=min_films, min_nb_collab=min_collab)
-            return map.create_figure()
+            return render(min_films, min_collab)
     
     def get_app(self):
-        return copy.deepcopy(self.app)
+        return self.app
     
     def plot(self):
-        return self.app.run(debug=True)
\ No newline at end of file
+        return self.app.run(debug=True)
+
+
+class DynamicTemporalMap:
+
+    def __init__(self, movies_df, frames=COLD_WAR_PERIODS, min_nb_movies=1):
+        # `frames` maps a label to its first and last year, e.g. `COLD_WAR_PERIODS` or
+        # `get_rolling_frames(window=5)`. The networks of all the frames are computed together and
+        # the figure of each frame is rendered once, the time slider only switches between them
+        index = TemporalCollaborationIndex(movies_df, frames)
+        labels = index.frames
+
+        @lru_cache(maxsize=FIGURE_CACHE_SIZE)
+        def render(frame, min_collab):
+            return StaticMap.from_index(index[labels[frame]], min_nb_movies=min_nb_movies, min_nb_collab=min_collab).create_figure()
+
+        for frame in range(len(labels)):
+            render(frame, 0)
+
+        self.app = dash.Dash(__name__)
+
+        self.app.layout = html.Div([
+            html.H1('Film Production Collaboration Network over Time'),
+
+            html.Div([
+                html.Label('Period:'),
+                dcc.Slider(
+                    id='frame-slider',
+                    min=0,
+                    max=len(labels) - 1,
+                    step=1,
+                    value=0,
+                    marks={i: label for i, label in enumerate(labels) if i % max(1, len(labels) // 10) == 0},
+                ),
+            ]),
+
+            html.Div([
+                html.Label('Minimum Collaboration Count:'),
+                dcc.Slider(
+                    id='min-collab-slider',
+                    min=0,
+                    max=20,
+                    step=1,
+                    value=0,
+                    marks={i: str(i) for i in range(0, 21, 5)},
+                ),
+            ]),
+
+            dcc.Graph(id='film-network-temporal-map'),
+        ])
+
+        @self.app.callback(
+            dash.dependencies.Output('film-network-temporal-map', 'figure'),
+            [
+                dash.dependencies.Input('frame-slider', 'value'),
+                dash.dependencies.Input('min-collab-slider', 'value'),
+            ]
+        )
+        def update_map(frame, min_collab):
+            return render(frame, min_collab)
+
+    def get_app(self):
+        return self.app
+
+    def plot(self):
+        return self.app.run(debug=True)
@@ -1,6 +1,7 @@
 import pandas as pd
-from collections import Counter
+import numpy as np
 from src.utils.constants import *
+from src.utils.vocabulary import RaggedColumn
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 from src.analysis.intro import *
@@ -10,39 +11,22 @@ import requests
 import json
 
 def compute_side_movie_count_per_country(df):
-    # Initialize and assign counters
-    western_counter = Counter()
-    eastern_counter = Counter()
-    none_counter = Counter()
-
-    for index, row in df.iterrows():
-        countries = row['countries']
-        cold_war_side = row['cold_war_side']
-        
-        for country in countries:
-            if cold_war_side == 'Western':
-                western_counter[country] += 1
-            elif cold_war_side == 'Eastern':
-                eastern_counter[country] += 1
-            else:
-                none_counter[country] += 1
-
-    # Convert to DataFrames
-    western_df = pd.DataFrame.from_dict(western_counter, orient='index', columns=['Western']).reset_index()
-    eastern_df = pd.DataFrame.from_dict(eastern_counter, orient='index', columns=['Eastern']).reset_index()
-    none_df = pd.DataFrame.from_dict(none_counter, orient='index', columns=['None']).reset_index()
-
-    # Merge DataFrames
-    country_counts_df = pd.DataFrame.from_dict(Counter([country for sublist in df['countries'] for country in sublist]), orient='index', columns=['Occurrences']).reset_index()
-    country_counts_df = country_counts_df.rename(columns={'index': 'Country'})
-
-    country_counts_df = country_counts_df.merge(western_df, how='left', left_on='Country', right_on='index').drop(columns=['index'])
-    country_counts_df = country_counts_df.merge(eastern_df, how='left', left_on='Country', right_on='index').drop(columns=['index'])
-    country_counts_df = country_counts_df.merge(none_df, how='left', left_on='Country', right_on='index').drop(columns=['index'])
-
-    # Fill NaN values with 0
-    country_counts_df = country_counts_df.fillna(0)
-    country_counts_df[['Western', 'Eastern', 'None']] = country_counts_df[['Western', 'Eastern', 'None']].astype(int)
+    countries = RaggedColumn.from_series(df['countries'])
+
+    # Count the countries of the Western (0), Eastern (1) and other (2) movies in one pass
+    sides = df['cold_war_side'].to_numpy()
+    groups = np.where(sides == 'Western', 0, np.where(sides == 'Eastern', 1, 2))
+    counts = countries.count_by(groups, 3)
+
+    # Countries in the order of their first appearance
+    ids = countries.first_occurrences()
+    country_counts_df = pd.DataFrame({
+        'Country': countries.vocabulary.decode(ids),
+        'Occurrences': counts.sum(axis=0)[ids],
+        'Western': counts[0, ids],
+        'Eastern': counts[1, ids],
+        'None': counts[2, ids],
+    })
 
     return country_counts_df
 
@@ -1,26 +1,27 @@
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
+import numpy as np
 from src.utils.constants import *
+from src.utils.vocabulary import RaggedColumn, counts_to_frame
 
 def compute_lang_distribution(df):
-    languages_exploded = df.explode('languages')
-    languages_count = languages_exploded['languages'].value_counts().reset_index()
-    languages_count.columns = ['language', 'count']
-    languages_count = languages_count.sort_values(by='count', ascending=False)
-
-    western_movies = df[df['cold_war_side'] == 'Western']
-    western_languages = western_movies.explode('languages')
-    western_languages = western_languages[western_languages['languages'] != '']
-    western_languages_count = western_languages['languages'].value_counts().reset_index()
-    western_languages_count.columns = ['language', 'count']
-
-    eastern_movies = df[df['cold_war_side'] == 'Eastern']
-    eastern_languages = eastern_movies.explode('languages')
-    eastern_languages = eastern_languages[eastern_languages['languages'] != '']
-    eastern_languages = eastern_languages[eastern_languages['languages'] != '??????']
-    eastern_languages_count = eastern_languages['languages'].value_counts().reset_index()
-    eastern_languages_count.columns = ['language', 'count']
+    languages = RaggedColumn.from_series(df['languages'])
+    vocabulary = languages.vocabulary
+
+    # Languages in the order of their first appearance, to break the ties between the counts
+    ids = languages.first_occurrences()
+    names = vocabulary.decode(ids)
+
+    languages_count = counts_to_frame(vocabulary, languages.count(), ids, 'language', 'count')
+
+    sides = df['cold_war_side'].to_numpy()
+    western_languages_count = counts_to_frame(
+        vocabulary, languages.count(sides == 'Western'), ids[names != ''], 'language', 'count'
+    )
+    eastern_languages_count = counts_to_frame(
+        vocabulary, languages.count(sides == 'Eastern'), ids[~np.isin(names, ['', '??????'])], 'language', 'count'
+    )
 
     return languages_count, western_languages_count, eastern_languages_count
 
@@ -11,6 +11,7 @@ from ipywidgets import interact, Dropdown
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from src.utils.constants import *
+from src.utils.vocabulary import Vocabulary, counts_to_frame, first_occurrences
 
 
 def create_comparison_df(
@@ -240,17 +241,29 @@ def plot_relative_difference(comparison_df, compared, abs=False, prop=False):
 
 def clean_genre_explode(movies_df):
     genres_df = movies_df[["countries", "cold_war_side", "genres", "release_date"]]
+    genres_df = genres_df.explode("genres")
 
-    genres_df = genres_df.explode("genres")[genres_df.explode("genres") != "\\N"]
-    genres_df["genres"] = (
-        genres_df["genres"]
+    # Clean each distinct genre once, then map the exploded rows through their ids
+    genres = Vocabulary.from_values(genres_df["genres"])
+    terms = pd.Series(genres.terms, dtype=object)
+    cleaned_terms = (
+        terms.where(terms != "\\N")
         .str.title()
         .str.strip()
         .replace({"Sci-Fi": "Science Fiction"})
     )
-
-    genre_counts = genres_df["genres"].value_counts().head(20)
-    common_genres = genre_counts.head(12).index
+    cleaned = Vocabulary.from_values(cleaned_terms)
+    cleaned_ids = np.append(cleaned.encode(cleaned_terms), -1)[genres.encode(genres_df["genres"])]
+    genres_df["genres"] = cleaned.decode(cleaned_ids)
+
+    genre_counts = counts_to_frame(
+        cleaned,
+        np.bincount(cleaned_ids[cleaned_ids >= 0], minlength=len(cleaned)),
+        first_occurrences(cleaned_ids),
+        "genres",
+        "count",
+    )
+    common_genres = pd.Index(genre_counts["genres"].head(12), name="genres")
 
     return genres_df, common_genres
 
@@ -3,21 +3,20 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from src.utils.plots_template import *
 import spacy
-from gensim import corpora
-from gensim.models.ldamodel import LdaModel
 from pyLDAvis import gensim_models
 import warnings
-import pickle
 from src.utils.constants import *
 from src.utils.helpers import *
+from src.utils.text_normalization import TextNormalizer
+from src.utils.topic_models import TopicModelRegistry
 
 warnings.filterwarnings("ignore")
 
-BEGIN_COLD_WAR = (1947, 1953)
-CRISIS = (1954, 1962)
-DETENT = (1963, 1974)
-SECOND_COLD_WAR = (1975, 1984)
-END = (1985, 1991)
+BEGIN_COLD_WAR = COLD_WAR_PERIODS["Blocs Establishment"]
+CRISIS = COLD_WAR_PERIODS["Major tensions and crises"]
+DETENT = COLD_WAR_PERIODS["Détente"]
+SECOND_COLD_WAR = COLD_WAR_PERIODS["Second Cold War"]
+END = COLD_WAR_PERIODS["End of the Cold War"]
 
 THEME_PERIODS = [
     "Begin (47-53)",
@@ -68,30 +67,24 @@ def create_theme(df):
 
 # Preprocess the text
 def preprocess(string_list, nlp, words_to_remove):
-    docs = [nlp(s) for s in string_list]
-    tokens = []
-    for doc in docs:
-        tokens.extend(
-            [
-                token.lemma_
-                for token in doc
-                if not token.is_stop
-                and not token.is_punct
-                and token.lemma_ not in words_to_remove
-            ]
-        )
-    return tokens
-
+    """
+    Lemmas of the phrases of a list, without the stop words, the punctuation and `words_to_remove`.
+
+    `nlp` is a `TextNormalizer`, or a spaCy pipeline used without cache.
+    """
+    normalizer = nlp if isinstance(nlp, TextNormalizer) else TextNormalizer(nlp, cache_path=None)
+    return [
+        lemma
+        for lemma, is_stop, is_punct in normalizer.tokens(string_list)
+        if not is_stop and not is_punct and lemma not in words_to_remove
+    ]
 
-def topic_detection(df, nb_topics, nb_passes):
-    # Create a dictionary and corpus for Gensim
-    dictionary = corpora.Dictionary(df)
-    corpus = [dictionary.doc2bow(text) for text in df]
 
-    # Train LDA model
-    lda_model = LdaModel(
-        corpus, num_topics=nb_topics, id2word=dictionary, passes=nb_passes
-    )
+def topic_detection(df, nb_topics, nb_passes, registry=None, seed=42):
+    # Get the LDA model of the corpus, trained only if it is not in the registry yet
+    if registry is None:
+        registry = TopicModelRegistry()
+    lda_model, corpus, dictionary = registry.get(df, nb_topics, nb_passes, seed)
 
     # Print the topics
     for idx, topic in lda_model.print_topics(-1):
@@ -114,20 +107,18 @@ def get_dominant_topic(lda_model, corpus):
     return topics
 
 
-def create_theme_topics(theme_df):
-    nlp = spacy.load("en_core_web_sm")
+def create_theme_topics(theme_df, n_process=1, nb_topics=5, nb_passes=15):
+    # `nb_topics` and `nb_passes` can be chosen with `sweep_topic_models(theme_df["processed_repres"])`
+    normalizer = TextNormalizer(spacy.load("en_core_web_sm"), n_process=n_process)
     words_to_remove = {"theme", "soviet", "ii", "vs", "vs.", " "}
+    # Lemmatize each distinct theme once, then build the lists of the movies from the cache
+    normalizer.analyze_column(theme_df["theme"])
+    normalizer.save()
     theme_df["processed_repres"] = theme_df["theme"].apply(
-        preprocess, args=(nlp, words_to_remove)
-    )
-    theme_topic = topic_detection(theme_df["processed_repres"], 5, 15)
-    pickle.dump(
-        theme_topic,
-        open(
-            DATA_FOLDER + "theme_topic3.pkl",
-            "wb",
-        ),
+        preprocess, args=(normalizer, words_to_remove)
     )
+    # The model is saved in the `TopicModelRegistry`, a rerun on the same themes loads it
+    theme_topic = topic_detection(theme_df["processed_repres"], nb_topics, nb_passes)
     return theme_topic
 
 
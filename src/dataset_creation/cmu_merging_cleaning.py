@@ -1,13 +1,16 @@
 import pandas as pd
 from src.utils.constants import *
 from src.utils.helpers import *
+from src.utils.raw_data import read_raw
+from src.utils.artifacts import save_artifact
 
 
 def create_plot_summary_dataset():
 
     # Load CMU character data
-    df_characters = pd.read_table(
+    df_characters = read_raw(
         CMU_CHARACTER,
+        sep="\t",
         names=[
             "wikipedia_id",
             "freebase_id",
@@ -25,17 +28,11 @@ def create_plot_summary_dataset():
         ],
     )
 
-    df_characters["release_date"] = df_characters["release_date"].apply(
-        convert_to_datetime
-    )
-    df_characters["release_date"] = pd.to_datetime(
-        df_characters["release_date"], errors="coerce"
+    df_characters["release_date"] = convert_to_datetime_series(
+        df_characters["release_date"]
     )
 
-    df_characters["actor_dob"] = df_characters["actor_dob"].apply(convert_to_datetime)
-    df_characters["actor_dob"] = pd.to_datetime(
-        df_characters["actor_dob"], errors="coerce"
-    )
+    df_characters["actor_dob"] = convert_to_datetime_series(df_characters["actor_dob"])
     df_characters.loc[df_characters["actor_height"] == 510, "actor_height"] = 1.78
     df_characters.drop(
         df_characters[df_characters["actor_height"] > 2.5].index, inplace=True
@@ -47,8 +44,9 @@ def create_plot_summary_dataset():
     )
 
     # Load CMU movie data
-    df_movies = pd.read_table(
+    df_movies = read_raw(
         CMU_MOVIE,
+        sep="\t",
         names=[
             "wikipedia_id",
             "freebase_id",
@@ -63,10 +61,7 @@ def create_plot_summary_dataset():
         header=None,
     )
 
-    df_movies["release_date"] = df_movies["release_date"].apply(convert_to_datetime)
-    df_movies["release_date"] = pd.to_datetime(
-        df_movies["release_date"], errors="coerce"
-    )
+    df_movies["release_date"] = convert_to_datetime_series(df_movies["release_date"])
 
     df_movies.drop(df_movies[df_movies["runtime"] > 500].index, inplace=True)
     df_movies.drop(df_movies[df_movies["runtime"] <= 0].index, inplace=True)
@@ -98,8 +93,8 @@ def create_plot_summary_dataset():
 
     # Load CMU plot summaries
 
-    df_plots = pd.read_table(
-        PLOT_SUMMARIES, names=["wikipedia_id", "plot_summary"], header=None
+    df_plots = read_raw(
+        PLOT_SUMMARIES, sep="\t", names=["wikipedia_id", "plot_summary"], header=None
     )
 
     df_temp = pd.DataFrame(df_plots[df_plots.duplicated(subset=["plot_summary"])])
@@ -114,6 +109,7 @@ def create_plot_summary_dataset():
     df_movies = df_movies.join(df_plots.set_index("wikipedia_id"), on="wikipedia_id")
 
     df_movies.to_csv(DATA_FOLDER_PREPROCESSED + "movie_summaries.csv", index=False)
+    save_artifact(df_movies, "movie_summaries")
 
     return df_movies
 
@@ -1,6 +1,8 @@
 import pandas as pd
 from src.utils.constants import *
 from src.utils.helpers import *
+from src.utils.raw_data import read_raw
+from src.utils.artifacts import save_artifact
 
 
 def get_plot_summary(tconst, imdb_instance):
@@ -17,18 +19,8 @@ def get_plot_summary(tconst, imdb_instance):
 
 
 def combine_columns(df, name_1, name_2):
-    df[name_1] = df.apply(
-        lambda row: list(
-            set(
-                (row[name_1] if isinstance(row[name_1], list) else [])
-                + (row[name_2] if isinstance(row[name_2], list) else [])
-            )
-        ),
-        axis=1,
-    )
-
-    # Replace empty lists by NaN
-    df[name_1] = df[name_1].apply(lambda x: np.nan if len(x) == 0 else x)
+    # Union of the two list columns, empty lists are replaced by NaN
+    df[name_1] = union_list_columns(df[name_1], df[name_2])
 
     return df
 
@@ -57,13 +49,89 @@ def clean_countries(row):
     return countries
 
 
-def get_soviet_movies():
-    title_akas = pd.read_csv(IMDB_AKA, sep="\t", usecols=["titleId", "title", "region"])
-    title_basics = pd.read_csv(
-        IMDB_BASIC,
-        sep="\t",
-        usecols=["tconst", "primaryTitle", "titleType", "startYear", "genres"],
-    )
+# IMDb regions related to the Soviet Union, "SUHH" is the historical code of the Soviet Union
+SOVIET_REGIONS = {
+    "SU",
+    "SUHH",
+    "RU",
+    "UA",
+    "BY",
+    "KZ",
+    "UZ",
+    "GE",
+    "AM",
+    "AZ",
+    "LT",
+    "LV",
+    "EE",
+    "TM",
+    "KG",
+    "TJ",
+    "MD",
+}
+
+IMDB_AKA_COLUMNS = ["titleId", "title", "region"]
+IMDB_BASIC_COLUMNS = ["tconst", "primaryTitle", "titleType", "startYear", "genres"]
+
+
+def read_soviet_akas(chunksize):
+    """
+    Stream `title.akas.tsv` and keep only the titles released in a Soviet region.
+
+    Arguments:
+        chunksize: the number of rows read at once
+
+    Returns:
+        The DataFrame of the Soviet titles, in the order of the file
+    """
+    chunks = [
+        chunk[chunk["region"].isin(SOVIET_REGIONS)]
+        for chunk in pd.read_csv(
+            IMDB_AKA, sep="\t", usecols=IMDB_AKA_COLUMNS, chunksize=chunksize
+        )
+    ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_movie_basics(tconsts, chunksize):
+    """
+    Stream `title.basics.tsv` and keep only the movies whose identifier is in `tconsts`.
+
+    Arguments:
+        tconsts: the set of IMDb identifiers to keep
+        chunksize: the number of rows read at once
+
+    Returns:
+        The DataFrame of the selected movies
+    """
+    chunks = [
+        chunk[(chunk["titleType"] == "movie") & chunk["tconst"].isin(tconsts)]
+        for chunk in pd.read_csv(
+            IMDB_BASIC, sep="\t", usecols=IMDB_BASIC_COLUMNS, chunksize=chunksize
+        )
+    ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def get_soviet_movies(streaming=False, chunksize=500_000):
+    """
+    Extract the movies related to the Soviet Union from the IMDb dumps.
+
+    Arguments:
+        streaming: if True, the dumps are read by chunks and filtered on the fly so that the
+                   memory used stays bounded whatever their size. Otherwise they are fully
+                   loaded through the Parquet cache, which is faster when enough memory is available.
+        chunksize: the number of rows read at once in streaming mode
+
+    Returns:
+        The DataFrame of the Soviet movies, one row per primary title
+    """
+    if streaming:
+        title_akas = read_soviet_akas(chunksize)
+        title_basics = read_movie_basics(set(title_akas["titleId"]), chunksize)
+    else:
+        title_akas = read_raw(IMDB_AKA, sep="\t", usecols=IMDB_AKA_COLUMNS)
+        title_basics = read_raw(IMDB_BASIC, sep="\t", usecols=IMDB_BASIC_COLUMNS)
 
     # Merge the DataFrames on the common column tconst
     imdb_movies = pd.merge(
@@ -83,30 +151,8 @@ def get_soviet_movies():
         ]
     ]
 
-    # select region that are related to the Soviet Union
-    regions = [
-        "SU",
-        "RU",
-        "UA",
-        "BY",
-        "KZ",
-        "UZ",
-        "GE",
-        "AM",
-        "AZ",
-        "LT",
-        "LV",
-        "EE",
-        "TM",
-        "KG",
-        "TJ",
-        "MD",
-    ]
-
     # Filter the movies that are related to the Soviet Union
-    soviet_movies = imdb_movies[
-        imdb_movies["region"].fillna("").str.contains("|".join(regions), case=False)
-    ]
+    soviet_movies = imdb_movies[imdb_movies["region"].isin(SOVIET_REGIONS)]
 
     # Drop the columns that are not needed
     soviet_movies = (
@@ -118,42 +164,105 @@ def get_soviet_movies():
     return soviet_movies
 
 
-def create_dataset_api():
-    from concurrent.futures import ThreadPoolExecutor
-    from tqdm import tqdm
-    import time
-    from imdb import IMDb
-    from functools import partial
+def create_dataset_api(
+    streaming=False,
+    imdb_instance=None,
+    max_workers=4,
+    requests_per_second=4,
+    max_retries=3,
+    cache_path=IMDB_PLOT_CACHE,
+):
+    """
+    Fetch the plots of the Soviet movies with IMDbPY and save them to `soviet_movies.tsv`.
+
+    The plots go through a persistent SQLite cache: an interrupted run resumes where it stopped
+    and the movies already fetched are skipped.
+
+    Arguments:
+        streaming: whether to extract the Soviet movies in streaming mode, see `get_soviet_movies`
+        imdb_instance: the IMDbPY instance, a local stub can be given to run offline
+        max_workers: the number of concurrent requests
+        requests_per_second: the maximum number of requests sent to IMDb per second
+        max_retries: the number of retries of a failed request
+        cache_path: the path of the SQLite plot cache
+    """
+    from src.dataset_creation.imdb_plots import PlotCache, fetch_plots
+
+    if imdb_instance is None:
+        from imdb import IMDb
+
+        imdb_instance = IMDb()
+
+    soviet_movies = get_soviet_movies(streaming=streaming)
+
+    with PlotCache(cache_path) as cache:
+        plots = fetch_plots(
+            soviet_movies["tconst"],
+            imdb_instance,
+            cache,
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            max_retries=max_retries,
+        )
 
-    time.sleep(1)
+    soviet_movies["plot"] = soviet_movies["tconst"].map(plots)
 
-    imdb_instance = IMDb()
+    # save the dataframe to soviet_movies.tsv
+    soviet_movies.to_csv(DATA_FOLDER_PREPROCESSED + "soviet_movies.tsv", sep="\t")
 
-    soviet_movies = get_soviet_movies()
 
-    # Use partial to pass the IMDb instance to the function
-    get_plot_with_imdb = partial(get_plot_summary, imdb_instance=imdb_instance)
+def merge_sources(df_left, df_right, title_matching, threshold, source_name):
+    """
+    Outer merge of two sources on their titles.
+
+    Arguments:
+        df_left: the first source
+        df_right: the second source
+        title_matching: "exact" to merge on the raw titles, "fuzzy" to match the normalized
+                        titles within the same release years, see `title_matching.py`
+        threshold: the minimum similarity of a fuzzy match
+        source_name: the name of the second source, used to save its match table
+    """
+    if title_matching == "exact":
+        return pd.merge(
+            df_left,
+            df_right,
+            on="title",
+            how="outer",
+            suffixes=("_original", "_additional"),
+        )
+    if title_matching != "fuzzy":
+        raise ValueError(f"Unknown title matching {title_matching}")
 
-    with ThreadPoolExecutor(max_workers=4) as executor:
+    from src.dataset_creation.title_matching import merge_on_titles
 
-        soviet_movies["plot"] = list(
-            tqdm(
-                executor.map(get_plot_with_imdb, soviet_movies["tconst"]),
-                total=len(soviet_movies),
-            )
-        )
+    df_merged, matches = merge_on_titles(df_left, df_right, threshold=threshold)
+    matches.to_csv(
+        DATA_FOLDER_PREPROCESSED + f"title_matches_{source_name}.csv", index=False
+    )
+    print(f"{len(matches)} movies matched with {source_name}")
+    return df_merged
 
-    # save the dataframe to soviet_movies.tsv
-    soviet_movies.to_csv(DATA_FOLDER_PREPROCESSED + "soviet_movies.tsv", sep="\t")
 
+def create_merged_dataset(title_matching="exact", threshold=0.9):
+    """
+    Merge the CMU movies with the TMDb and the Soviet IMDb movies and save them to `merged_movies.csv`.
 
-def create_merged_dataset():
+    Arguments:
+        title_matching: "exact" to merge the sources on the raw titles, "fuzzy" to match the
+                        normalized titles within the same release years (±1). The GPT answers of
+                        `output4o.pkl` are aligned with the rows of the exact merge.
+        threshold: the minimum similarity of a fuzzy match
+    """
     # Load the preprocessed data
 
+    # The CSV is read on purpose instead of the typed artifact: its list columns are strings that
+    # `combine_columns` ignores, and the GPT answers of `output4o.pkl` are aligned with the rows
+    # produced this way
     df_movies = pd.read_csv(DATA_FOLDER_PREPROCESSED + "movie_summaries.csv")
 
     # TMDb
-    df_tmdb_movies = pd.read_csv(
+    df_tmdb_movies = read_raw(
         TMDB_MOVIE,
         usecols=[
             "id",
@@ -169,7 +278,7 @@ def create_merged_dataset():
         ],
     )
 
-    df_tmdb_keywords = pd.read_csv(TMDB_KEYWORDS)
+    df_tmdb_keywords = read_raw(TMDB_KEYWORDS)
 
     # Use the helper function to preprocess the data before the merging
     df_tmdb_movies = preprocess_movie_data(df_tmdb_movies)
@@ -184,21 +293,13 @@ def create_merged_dataset():
         "spoken_languages",
         "keywords",
     ]:
-        df_tmdb_movies[column_name] = df_tmdb_movies[column_name].apply(
-            lambda row: (
-                [item["name"] for item in ast.literal_eval(row)]
-                if pd.notnull(row) and ast.literal_eval(row)
-                else np.nan
-            )
+        df_tmdb_movies[column_name] = decode_name_list_column(
+            df_tmdb_movies[column_name]
         )
 
     # Merge with MoviesSummaries based on the title
-    df_merged_movies = pd.merge(
-        df_movies,
-        df_tmdb_movies,
-        on="title",
-        how="outer",
-        suffixes=("_original", "_additional"),
+    df_merged_movies = merge_sources(
+        df_movies, df_tmdb_movies, title_matching, threshold, "tmdb"
     )
 
     for _, column_name in enumerate(df_merged_movies.columns):
@@ -276,12 +377,8 @@ def create_merged_dataset():
     )
 
     # Merge the ´soviet_movies´ dataframe with the ´df_merged_movies´
-    df_merged_movies = pd.merge(
-        df_merged_movies,
-        soviet_movies,
-        on="title",
-        how="outer",
-        suffixes=("_original", "_additional"),
+    df_merged_movies = merge_sources(
+        df_merged_movies, soviet_movies, title_matching, threshold, "imdb"
     )
 
     df_merged_movies["release_date_original"] = df_merged_movies[
@@ -472,6 +569,7 @@ def create_merged_dataset():
 
     # save the dataframe to merged_movies.csv
     df_merged_movies.to_csv(DATA_FOLDER_PREPROCESSED + "merged_movies.csv", index=False)
+    save_artifact(df_merged_movies, "merged_movies")
 
     return df_merged_movies
 
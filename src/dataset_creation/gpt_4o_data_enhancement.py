@@ -1,52 +1,16 @@
 import pandas as pd
 from src.utils.helpers import *
 from src.utils.constants import *
-import pickle
 import re
+from src.utils.artifacts import GPT_LIST_COLUMNS, load_artifact, save_artifact
+from src.dataset_creation.gpt_answer_parser import ANSWER_FIELDS, FAILED_VALUE, iter_answers, parse_answers, parse_answer
 
 
 def parse_gpt_answer(answer):
-
-    def split(line):
-        line = re.sub(r"^[^:]*:", "", line)
-        line = line.replace(", ", ",")
-        # remove lasst character if " "
-        if line[-1] == " ":
-            line = line[:-1]
-        return re.split(r",|\n", line)
-
-    parsed_answer = {}
-
-    answer = answer.replace(" \n", "\n")
-    answer = answer.replace("\n\n", "\n")
-
-    # Split the answer
-    answer = answer.split("\n")
-
-    try:
-        # Parse the Cold War side
-        parsed_answer["cold_war_side"] = answer[0]
-        # Parse the Western bloc representation
-        parsed_answer["character_western_bloc_representation"] = split(answer[1])
-        # Parse the Eastern bloc representation
-        parsed_answer["character_eastern_bloc_representation"] = split(answer[2])
-        # Parse the Western bloc values;
-        parsed_answer["western_bloc_values"] = split(answer[3])
-        # Parse the Eastern bloc values
-        parsed_answer["eastern_bloc_values"] = split(answer[4])
-        # Parse the theme of the movie
-        parsed_answer["theme"] = split(answer[5])
-    except:
-        parsed_answer = {
-            "cold_war_side": "None",
-            "character_western_bloc_representation": "None",
-            "character_eastern_bloc_representation": "None",
-            "western_bloc_values": "None",
-            "eastern_bloc_values": "None",
-            "theme": "None",
-        }
-
-    return parsed_answer
+    """
+    Parse an answer of the model, see `gpt_answer_parser.parse_answer` for the errors.
+    """
+    return parse_answer(answer)[0]
 
 
 def preprocess_side(row):
@@ -76,18 +40,77 @@ def preprocess_side(row):
     return row
 
 
-def create_enhanced_dataset():
-    output_4o = pickle.load(open(DATA_FOLDER_PREPROCESSED + "output4o.pkl", "rb"))
-    parsed_4o = []
+def preprocess_sides(movies_df):
+    """
+    Column-wise version of `preprocess_side`, applied to the whole DataFrame at once.
+
+    Arguments:
+        movies_df: the DataFrame with the parsed answers of the model
+
+    Returns:
+        A copy of `movies_df` equal to `movies_df.apply(preprocess_side, axis=1)`, except that the
+        columns not preprocessed keep their dtype where the row-wise `apply` makes them all object
+    """
+    movies_df = movies_df.copy()
+
+    # Remove all non alphanumeric characters, the object dtype keeps the Unicode `\W` of `re` and
+    # is the dtype given by the row-wise `apply`
+    sides = movies_df["cold_war_side"].astype(object)
+    movies_df["cold_war_side"] = (
+        sides.str.replace(r"\W+", "", regex=True)
+        .where(sides.map(type) == str, "None")
+        .astype(object)
+    )
 
-    for answer in output_4o:
-        parsed_4o.append(parse_gpt_answer(answer))
+    for column in GPT_LIST_COLUMNS:
+        missing = movies_df[column].isna()
+        movies_df.loc[missing, column] = pd.Series(
+            [["None"] for _ in range(missing.sum())], index=movies_df.index[missing], dtype=object
+        )
 
-    movies_df = pd.read_csv(DATA_FOLDER_PREPROCESSED + "merged_movies.csv")
-    movies_df = movies_df.assign(
-        **{key: [d[key] for d in parsed_4o] for key in parsed_4o[0].keys()}
+    # The first item of a list, or the first character of a failed "None" answer as in `preprocess_side`
+    no_representation = (
+        (movies_df["character_western_bloc_representation"].str[0] == "None")
+        & (movies_df["character_eastern_bloc_representation"].str[0] == "None")
     )
-    movies_df = movies_df.apply(preprocess_side, axis=1)
+    movies_df.loc[no_representation, "cold_war_side"] = "None"
+
+    return movies_df
+
+
+def create_enhanced_dataset(answers_path=DATA_FOLDER_PREPROCESSED + "output4o.pkl", processes=None):
+    """
+    Add the parsed answers of the model to the merged dataset.
+
+    Arguments:
+        answers_path: the answers, the pickled list of `create_gpt_outputs` or its JSONL store
+        processes: the number of worker processes parsing the answers, None to parse them here
+
+    Returns:
+        The enhanced DataFrame. The answers that could not be parsed are reported in
+        `GPT_PARSE_ERRORS`, one row per field in error.
+    """
+    parsed, errors = parse_answers(iter_answers(answers_path), processes)
+
+    movies_df = load_artifact("merged_movies")
+
+    # The movies without answer are parsed as failed answers
+    missing = movies_df.index.difference(parsed.index)
+    parsed = parsed.reindex(movies_df.index, fill_value=FAILED_VALUE)
+    errors = pd.concat(
+        [errors, pd.DataFrame({"index": missing, "field": "answer", "error": "missing answer"})],
+        ignore_index=True,
+    )
+    errors.to_csv(GPT_PARSE_ERRORS, index=False)
+    if len(errors) > 0:
+        print(f"{errors['index'].nunique()} answers could not be parsed, see {GPT_PARSE_ERRORS}")
+        print(errors.groupby(["field", "error"]).size().to_string())
+
+    for field in ANSWER_FIELDS:
+        movies_df[field] = parsed[field]
+    movies_df = preprocess_sides(movies_df)
+
+    save_artifact(movies_df, "v2_movies_cleaned")
 
     movies_df["cold_war_side"] = movies_df["cold_war_side"].apply(lambda x: f'"{x}"')
 
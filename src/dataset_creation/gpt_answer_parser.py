@@ -0,0 +1,147 @@
+import os
+import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.utils.artifacts import GPT_LIST_COLUMNS
+
+# Fields of an answer, one per line in the order asked by the prompt (see `PROMPT_FILE`)
+ANSWER_FIELDS = ["cold_war_side"] + GPT_LIST_COLUMNS
+
+# Value of every field of an answer that could not be parsed
+FAILED_VALUE = "None"
+
+
+def split_items(line):
+    """
+    Split the line of a list field into its items, without its label.
+
+    The label (e.g. "Theme:") is everything up to the first colon. String methods are used instead
+    of the regexes `^[^:]*:` and `,|\n`, which match the same on a single line.
+
+    Returns:
+        The list of the items, or None if the line is empty once the label is removed
+    """
+    line = line[line.find(":") + 1 :]
+    line = line.replace(", ", ",")
+    if not line:
+        return None
+    # Remove the last character if " "
+    if line[-1] == " ":
+        line = line[:-1]
+    return line.split(",")
+
+
+def parse_answer(answer):
+    """
+    Parse an answer of the model, one field per line.
+
+    An answer is only kept if all its fields can be parsed, otherwise every field is set to
+    `FAILED_VALUE` and the reasons are reported.
+
+    Arguments:
+        answer: the answer of the model
+
+    Returns:
+        A tuple (parsed answer, errors): a dict mapping each field of `ANSWER_FIELDS` to its value
+        (a string for the Cold War side, lists of strings for the others) and a list of tuples
+        (field, reason), empty when the answer is parsed
+    """
+    lines = answer.replace(" \n", "\n").replace("\n\n", "\n").split("\n")
+
+    parsed = {"cold_war_side": lines[0]}
+    errors = []
+    for position, field in enumerate(GPT_LIST_COLUMNS, start=1):
+        if position >= len(lines):
+            errors.append((field, "missing line"))
+            continue
+        items = split_items(lines[position])
+        if items is None:
+            errors.append((field, "empty field"))
+        parsed[field] = items
+
+    if errors:
+        parsed = {field: FAILED_VALUE for field in ANSWER_FIELDS}
+    return parsed, errors
+
+
+def iter_answers(path):
+    """
+    Stream the answers of the model from the outputs of `create_gpt_outputs`.
+
+    Arguments:
+        path: the pickled list of the answers in the order of the dataset (".pkl"), or the JSONL
+              store of the enrichment (".jsonl") whose records hold the index of their movie. When a
+              movie was enriched several times (e.g. after a change of the prompt), its last record
+              wins.
+
+    Yields:
+        Tuples (index of the movie, answer)
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == ".pkl":
+        with open(path, "rb") as f:
+            yield from enumerate(pickle.load(f))
+    elif extension == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # The last line may be truncated if the enrichment was killed while writing
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                yield record["index"], record["output"]
+    else:
+        raise ValueError(f"Unknown format of the answers {path}")
+
+
+def collect(indexes, results):
+    """
+    Gather the parsed answers field by field, and their errors.
+    """
+    columns = {field: [] for field in ANSWER_FIELDS}
+    errors = []
+    for position, (index, (parsed, answer_errors)) in enumerate(zip(indexes, results)):
+        for field in ANSWER_FIELDS:
+            columns[field].append(parsed[field])
+        errors.extend((index, field, error, position) for field, error in answer_errors)
+    return columns, errors
+
+
+def parse_answers(answers, processes=None, chunksize=1000):
+    """
+    Parse a stream of answers into columns.
+
+    Arguments:
+        answers: an iterable of tuples (index of the movie, answer), e.g. `iter_answers(path)`
+        processes: the number of worker processes, the answers are parsed in this process if None.
+                   Sending the parsed answers back costs about as much as parsing them, the workers
+                   only pay off for long answers
+        chunksize: the number of answers sent to a worker at once
+
+    Returns:
+        A tuple (parsed, errors): the DataFrame of the parsed fields indexed by movie (one column
+        per field of `ANSWER_FIELDS`, the list fields hold lists of strings), and the DataFrame of
+        the parsing errors with the columns "index", "field" and "error"
+    """
+    indexes, texts = [], []
+    for index, answer in answers:
+        indexes.append(index)
+        texts.append(answer)
+
+    if processes is None:
+        columns, errors = collect(indexes, map(parse_answer, texts))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            columns, errors = collect(indexes, executor.map(parse_answer, texts, chunksize=chunksize))
+
+    # Keep the last answer of each movie
+    parsed = pd.DataFrame(columns, index=indexes, dtype=object)
+    last = ~parsed.index.duplicated(keep="last")
+    parsed = parsed[last]
+    errors = pd.DataFrame(errors, columns=["index", "field", "error", "position"])
+    errors = errors[last[errors["position"].to_numpy(dtype=int)]].drop(columns="position")
+    return parsed, errors.reset_index(drop=True)
+
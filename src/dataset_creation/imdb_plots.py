@@ -0,0 +1,198 @@
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+# Host queried by IMDbPY, all the workers share its rate limit
+IMDB_HOST = "www.imdb.com"
+
+
+class PlotCache:
+    """
+    Persistent cache of the IMDb plots, stored in a SQLite database keyed by tconst.
+
+    Every fetched movie is written as soon as it is received, with its plot or a "no plot" marker,
+    so an interrupted run resumes where it stopped. The cache can be shared between threads.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS plots ("
+                "tconst TEXT PRIMARY KEY, plot TEXT, has_plot INTEGER NOT NULL)"
+            )
+            self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM plots").fetchone()[0]
+
+    def get_plots(self):
+        """
+        Returns:
+            A dict mapping every cached tconst to its plot, or None if the movie has no plot
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT tconst, plot, has_plot FROM plots")
+            return {tconst: plot if has_plot else None for tconst, plot, has_plot in rows}
+
+    def add(self, tconst, plot):
+        """
+        Store the plot of a movie, `None` marks a movie without plot.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO plots VALUES (?, ?, ?)",
+                (tconst, plot, plot is not None),
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class RateLimiter:
+    """
+    Thread-safe rate limiter spacing the requests sent to each host.
+    """
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.next_slots = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        """
+        Block until a request can be sent to `host`.
+        """
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slots.get(host, now))
+            self.next_slots[host] = slot + self.interval
+        time.sleep(max(0, slot - now))
+
+
+class LocalIMDbStub:
+    """
+    Offline stand-in for the IMDbPY instance, serving plots from a dict.
+
+    Arguments:
+        plots: a dict mapping tconsts to their plot, movies missing from it have no plot
+        failure_rate: the probability that a request fails, to exercise the retries
+        seed: the seed of the failures
+    """
+
+    def __init__(self, plots, failure_rate=0.0, seed=42):
+        self.plots = {int(tconst[2:]): plot for tconst, plot in plots.items()}
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.nb_requests = 0
+
+    def get_movie(self, movie_id):
+        self.nb_requests += 1
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError(f"Simulated failure for movie {movie_id}")
+        plot = self.plots.get(movie_id)
+        return {"plot": [plot]} if plot else {}
+
+
+def fetch_plot(tconst, imdb_instance):
+    """
+    Fetch the plot of a movie, unlike `get_plot_summary` the errors are raised.
+
+    Arguments:
+        tconst: the IMDb identifier of the movie
+        imdb_instance: the IMDbPY instance, or any object with the same `get_movie` method
+
+    Returns:
+        The first plot summary of the movie, or None if it has no plot
+    """
+    movie = imdb_instance.get_movie(int(str(tconst)[2:]))
+    plot = movie.get("plot")
+    return plot[0] if plot else None
+
+
+def fetch_plot_with_retries(tconst, imdb_instance, rate_limiter, max_retries, backoff):
+    """
+    Fetch the plot of a movie, retrying with an exponential backoff when the request fails.
+
+    Returns:
+        A tuple (plot, success), `success` is False if every attempt failed
+    """
+    for attempt in range(max_retries + 1):
+        rate_limiter.wait(IMDB_HOST)
+        try:
+            return fetch_plot(tconst, imdb_instance), True
+        except Exception:
+            if attempt < max_retries:
+                time.sleep(backoff * 2**attempt * (1 + random.random()))
+    return None, False
+
+
+def fetch_plots(
+    tconsts,
+    imdb_instance,
+    cache,
+    max_workers=4,
+    requests_per_second=4,
+    max_retries=3,
+    backoff=1.0,
+):
+    """
+    Fetch the plots of several movies through the persistent cache.
+
+    Cached tconsts are not requested again. The others are fetched concurrently and written to the
+    cache as soon as they are received. Movies whose requests kept failing are not cached, so the
+    next run tries them again.
+
+    Arguments:
+        tconsts: the IMDb identifiers of the movies
+        imdb_instance: the IMDbPY instance, or a stub such as `LocalIMDbStub`
+        cache: the `PlotCache` to read and fill
+        max_workers: the number of concurrent requests
+        requests_per_second: the maximum number of requests sent to IMDb per second, None to disable
+        max_retries: the number of retries of a failed request
+        backoff: the delay before the first retry in seconds, doubled at each retry
+
+    Returns:
+        A dict mapping each tconst to its plot, or None if it has no plot or could not be fetched
+    """
+    plots = cache.get_plots()
+    missing = [tconst for tconst in dict.fromkeys(tconsts) if tconst not in plots]
+    rate_limiter = RateLimiter(requests_per_second)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_plot_with_retries,
+                tconst,
+                imdb_instance,
+                rate_limiter,
+                max_retries,
+                backoff,
+            ): tconst
+            for tconst in missing
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            tconst = futures[future]
+            plot, success = future.result()
+            if success:
+                cache.add(tconst, plot)
+            plots[tconst] = plot
+
+    return {tconst: plots.get(tconst) for tconst in tconsts}
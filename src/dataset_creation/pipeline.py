@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import inspect
+import resource
+import importlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+from src.utils.constants import *
+from src.utils.artifacts import get_artifact_path
+
+
+class Stage:
+    """
+    Step of the dataset creation, declared by the files it reads and the files it writes.
+
+    Arguments:
+        name: the name of the stage
+        function: the function running the stage, as "module:function" so that it can be run in a
+                  child process
+        inputs: the paths of the files read by the stage
+        outputs: the paths of the files written by the stage
+        kwargs: the keyword arguments given to the function, they are part of the fingerprint
+        external: whether the stage calls external services (live or paid APIs). An external stage
+                  only runs when it is given explicitly as a target, otherwise its outputs are only
+                  checked for existence
+    """
+
+    def __init__(self, name, function, inputs, outputs, kwargs=None, external=False):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.kwargs = kwargs or {}
+        self.external = external
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+    @property
+    def module_name(self):
+        return self.function.split(":")[0]
+
+    def load_function(self):
+        module_name, function_name = self.function.split(":")
+        return getattr(importlib.import_module(module_name), function_name)
+
+
+# The stages building `preprocessed_movies.csv`, the IMDb plots are fetched through their own
+# cache (see `imdb_plots.py`) and the GPT answers through the store of `prompt_engineering.py`.
+# The stages querying IMDb and GPT are external: they are only run when asked explicitly, e.g.
+# `python -m src.dataset_creation.pipeline gpt_outputs`
+STAGES = [
+    Stage(
+        "movie_summaries",
+        "src.dataset_creation.cmu_merging_cleaning:create_plot_summary_dataset",
+        inputs=[CMU_CHARACTER, CMU_MOVIE, PLOT_SUMMARIES],
+        outputs=[
+            DATA_FOLDER_PREPROCESSED + "movie_summaries.csv",
+            get_artifact_path("movie_summaries"),
+        ],
+    ),
+    Stage(
+        "soviet_movies",
+        "src.dataset_creation.datasets_merging:create_dataset_api",
+        inputs=[IMDB_AKA, IMDB_BASIC],
+        outputs=[DATA_FOLDER_PREPROCESSED + "soviet_movies.tsv"],
+        external=True,
+    ),
+    Stage(
+        "merged_movies",
+        "src.dataset_creation.datasets_merging:create_merged_dataset",
+        inputs=[
+            DATA_FOLDER_PREPROCESSED + "movie_summaries.csv",
+            DATA_FOLDER_PREPROCESSED + "soviet_movies.tsv",
+            TMDB_MOVIE,
+            TMDB_KEYWORDS,
+        ],
+        outputs=[
+            DATA_FOLDER_PREPROCESSED + "merged_movies.csv",
+            get_artifact_path("merged_movies"),
+        ],
+    ),
+    Stage(
+        "gpt_outputs",
+        "src.prompt_engineering.prompt_engineering:create_gpt_outputs",
+        inputs=[get_artifact_path("merged_movies"), PROMPT_FILE],
+        outputs=[DATA_FOLDER_PREPROCESSED + "output4o.pkl"],
+        external=True,
+    ),
+    Stage(
+        "v2_movies_cleaned",
+        "src.dataset_creation.gpt_4o_data_enhancement:create_enhanced_dataset",
+        inputs=[
+            get_artifact_path("merged_movies"),
+            DATA_FOLDER_PREPROCESSED + "output4o.pkl",
+        ],
+        outputs=[
+            DATA_FOLDER_PREPROCESSED + "v2_movies_cleaned.csv",
+            get_artifact_path("v2_movies_cleaned"),
+            GPT_PARSE_ERRORS,
+        ],
+    ),
+    Stage(
+        "preprocessed_movies",
+        "src.dataset_creation.merged_dataset_preprocessing:create_preprocessed_movies",
+        inputs=[get_artifact_path("v2_movies_cleaned")],
+        outputs=[PREPROCESSED_MOVIES, get_artifact_path("preprocessed_movies")],
+    ),
+]
+
+
+def hash_file(path, block_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def get_code_version(module_name):
+    """
+    Hash the source of a module and of the project modules it uses directly, so that a stage is
+    run again when its code or the helpers it calls change.
+    """
+    module = importlib.import_module(module_name)
+    modules = {module_name: module}
+    for value in vars(module).values():
+        dependency = value if inspect.ismodule(value) else inspect.getmodule(value)
+        if dependency is not None and dependency.__name__.startswith("src."):
+            modules[dependency.__name__] = dependency
+
+    sha256 = hashlib.sha256()
+    for name in sorted(modules):
+        sha256.update(name.encode("utf-8"))
+        sha256.update(inspect.getsource(modules[name]).encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def run_stage(stage):
+    """
+    Run a stage, meant to be called in a fresh child process so that its peak memory is its own.
+
+    Returns:
+        A tuple (duration in seconds, peak resident memory in MB)
+    """
+    start = time.perf_counter()
+    stage.load_function()(**stage.kwargs)
+    duration = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    return duration, peak_mb
+
+
+class Pipeline:
+    """
+    Incremental runner of the dataset creation stages.
+
+    The dependencies between the stages are derived from their inputs and outputs. A stage is
+    skipped when its outputs exist and its fingerprint, the hash of its code, of its arguments and
+    of the content of its inputs, is the one of its last successful run. The other stages are run
+    as soon as their dependencies are done, independent ones in parallel, each in its own process.
+
+    Arguments:
+        stages: the list of `Stage`
+        state_path: the JSON file keeping the fingerprints of the last runs and the hashes of the
+                    files, which are only recomputed when the size or the modification time of a
+                    file changes
+    """
+
+    def __init__(self, stages=STAGES, state_path=PIPELINE_STATE):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.state = {"files": {}, "stages": {}}
+        if os.path.exists(state_path):
+            with open(state_path, "r") as f:
+                self.state = json.load(f)
+
+        producers = {
+            output: stage.name for stage in stages for output in stage.outputs
+        }
+        self.dependencies = {
+            stage.name: sorted(
+                {producers[path] for path in stage.inputs if path in producers}
+                - {stage.name}
+            )
+            for stage in stages
+        }
+
+    def save_state(self):
+        with open(self.state_path + ".tmp", "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def get_file_hash(self, path):
+        """
+        Returns:
+            The SHA-256 hash of the file, reused from the state if the file did not change
+        """
+        stat = os.stat(path)
+        cached = self.state["files"].get(path)
+        if (
+            cached is not None
+            and cached["size"] == stat.st_size
+            and cached["mtime"] == stat.st_mtime
+        ):
+            return cached["sha256"]
+
+        sha256 = hash_file(path)
+        self.state["files"][path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": sha256,
+        }
+        return sha256
+
+    def get_fingerprint(self, stage):
+        """
+        Returns:
+            The fingerprint of the stage, or None if one of its inputs is missing
+        """
+        if not all(os.path.exists(path) for path in stage.inputs):
+            return None
+        payload = {
+            "code": get_code_version(stage.module_name),
+            "function": stage.function,
+            "kwargs": repr(sorted(stage.kwargs.items())),
+            "inputs": {path: self.get_file_hash(path) for path in stage.inputs},
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def is_up_to_date(self, stage, fingerprint):
+        return (
+            fingerprint is not None
+            and self.state["stages"].get(stage.name) == fingerprint
+            and all(os.path.exists(path) for path in stage.outputs)
+        )
+
+    def select(self, targets):
+        """
+        Returns:
+            The names of the target stages and of all the stages they depend on
+        """
+        selected = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage {name}, the stages are {list(self.stages)}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.dependencies[name])
+        return selected
+
+    def run(self, targets=None, force=False, max_workers=2):
+        """
+        Run the stages that are out of date.
+
+        Arguments:
+            targets: the names of the stages to build with their dependencies, all of them if None.
+                     An external stage only runs if it is one of the targets, not when it is a
+                     dependency of one
+            force: whether to run the stages even if they are up to date
+            max_workers: the number of stages run in parallel
+
+        Returns:
+            A DataFrame with the status, the duration (s) and the peak memory (MB) of each stage
+
+        Raises:
+            RuntimeError: if a stage failed or the outputs of an external stage are missing, after
+                          the stages that do not depend on it are done
+        """
+        explicit = set(targets) if targets is not None else set()
+        selected = self.select(targets if targets is not None else self.stages)
+        remaining = [name for name in self.stages if name in selected]
+        report = {}
+        running = {}
+
+        # One process per stage: the memory of a stage is released when it ends and its peak
+        # memory is not mixed with the one of the previous stages
+        with ProcessPoolExecutor(
+            max_workers=max_workers, max_tasks_per_child=1
+        ) as executor:
+            while remaining or running:
+                for name in list(remaining):
+                    dependencies = self.dependencies[name]
+                    if any(
+                        report.get(dependency, {}).get("status") in ("failed", "blocked", "missing")
+                        for dependency in dependencies
+                    ):
+                        report[name] = {"status": "blocked"}
+                        remaining.remove(name)
+                    elif all(dependency in report for dependency in dependencies):
+                        remaining.remove(name)
+                        stage = self.stages[name]
+                        if stage.external and name not in explicit:
+                            # Never call the external services implicitly
+                            if all(os.path.exists(path) for path in stage.outputs):
+                                print(f"[pipeline] {name}: external, existing outputs used")
+                                report[name] = {"status": "external"}
+                            else:
+                                print(
+                                    f"[pipeline] {name}: external and its outputs are missing, "
+                                    "run it explicitly"
+                                )
+                                report[name] = {"status": "missing"}
+                            continue
+                        fingerprint = self.get_fingerprint(stage)
+                        if not force and self.is_up_to_date(stage, fingerprint):
+                            print(f"[pipeline] {name}: up to date, skipped")
+                            report[name] = {"status": "skipped"}
+                            continue
+                        print(f"[pipeline] {name}: running")
+                        running[executor.submit(run_stage, stage)] = (name, fingerprint)
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, fingerprint = running.pop(future)
+                    try:
+                        duration, peak_mb = future.result()
+                    except Exception as e:
+                        print(f"[pipeline] {name}: failed ({e!r})")
+                        report[name] = {"status": "failed", "error": repr(e)}
+                        continue
+
+                    print(
+                        f"[pipeline] {name}: done in {duration:.1f}s, peak memory {peak_mb:.0f} MB"
+                    )
+                    report[name] = {
+                        "status": "done",
+                        "duration_s": duration,
+                        "peak_memory_mb": peak_mb,
+                    }
+                    self.state["stages"][name] = fingerprint
+                    self.save_state()
+
+        self.save_state()
+        report = pd.DataFrame.from_dict(report, orient="index").reindex(
+            [name for name in self.stages if name in selected]
+        )
+        print(report.to_string())
+
+        failed = report.index[report["status"].isin(["failed", "missing"])].tolist()
+        if failed:
+            raise RuntimeError(
+                f"The stages {failed} failed or have missing outputs, see the logs above"
+            )
+        return report
+
+
+def run_pipeline(targets=None, force=False, max_workers=2):
+    """
+    Build the dataset, running only the stages whose inputs or code changed since their last run.
+    See `Pipeline.run`.
+    """
+    return Pipeline().run(targets=targets, force=force, max_workers=max_workers)
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    targets = [argument for argument in arguments if argument != "--force"]
+    run_pipeline(targets=targets or None, force="--force" in arguments)
@@ -0,0 +1,257 @@
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+# Leading articles dropped from the titles, "The Cranes Are Flying" and "Cranes Are Flying" get
+# the same key
+LEADING_ARTICLES = r"^(?:the|a|an|le|la|les|l|der|die|das|el|il)\s+"
+
+
+def normalize_title(titles):
+    """
+    Normalize titles for the matching: lowercase, accents, punctuation and leading article removed,
+    whitespace collapsed.
+
+    Arguments:
+        titles: a Series of titles
+
+    Returns:
+        A Series of normalized titles, NaN titles stay NaN
+    """
+    # Object dtype on purpose: the regexes of the Arrow strings only know ASCII words
+    return (
+        titles.astype(str)
+        .astype(object)
+        .str.normalize("NFKD")
+        .str.replace("[\u0300-\u036f]", "", regex=True)
+        .str.lower()
+        .str.replace("&", " and ", regex=False)
+        .str.replace(r"[^\w\s]", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .str.replace(LEADING_ARTICLES, "", regex=True)
+        .where(titles.notna(), np.nan)
+    )
+
+
+def get_release_year(release_dates):
+    """
+    Returns:
+        The release years as a float Series (NaN when missing), from dates, strings or years
+    """
+    if pd.api.types.is_numeric_dtype(release_dates):
+        return release_dates.astype(float)
+    return pd.to_datetime(
+        release_dates, format="mixed", errors="coerce"
+    ).dt.year.astype(float)
+
+
+def title_similarity(title_1, title_2, threshold=0.0):
+    """
+    Similarity between two normalized titles, the ratio of `difflib.SequenceMatcher`.
+
+    The cheap upper bounds of the ratio are checked first, 0 is returned as soon as one of them is
+    below `threshold`.
+    """
+    if title_1 == title_2:
+        return 1.0
+    matcher = SequenceMatcher(None, title_1, title_2, autojunk=False)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return 0.0
+    return matcher.ratio()
+
+
+def get_blocks(titles, years):
+    """
+    Build the blocking keys of the rows, a row is only compared with the rows sharing one of its keys.
+
+    Two keys per row, (first word, year) and (last word, year), so that a typo in one end of the
+    title does not prevent the match. For a title of one word both keys are that word, so it also
+    gets the keys (first 3 characters, year) and (last 3 characters, year): a single typo changes
+    at most one of them (e.g. "stalker" and "stalkr" share "sta").
+
+    Every row also gets the key (whole normalized title, year), used by `match_titles` to match the
+    rows without year to the rows with the same title whatever their year. Rows without year have
+    no other key, they only match exactly.
+
+    Returns:
+        A DataFrame with the columns "position" (position of the row), "block" and "year"
+    """
+    frame = pd.DataFrame(
+        {"position": np.arange(len(titles)), "title": titles.values, "year": years.values}
+    ).dropna(subset=["title"])
+    frame = frame[frame["title"] != ""]
+
+    words = frame["title"].str.split(" ")
+    dated = frame["year"].notna()
+    single_word = dated & (words.str.len() == 1)
+    blocks = [
+        frame.assign(block="first:" + words.str[0])[dated],
+        frame.assign(block="last:" + words.str[-1])[dated],
+        frame.assign(block="prefix:" + frame["title"].str[:3])[single_word],
+        frame.assign(block="suffix:" + frame["title"].str[-3:])[single_word],
+        frame.assign(block="title:" + frame["title"]),
+    ]
+    return pd.concat(blocks, ignore_index=True)[["position", "block", "year"]]
+
+
+def match_titles(
+    left_titles,
+    left_years,
+    right_titles,
+    right_years,
+    threshold=0.9,
+    year_tolerance=1,
+):
+    """
+    Match the movies of two sources on their titles and release years.
+
+    The candidate pairs are the rows sharing a blocking key (see `get_blocks`) whose release years
+    differ by at most `year_tolerance`, so the number of comparisons grows with the size of the
+    blocks instead of the product of the sizes of the sources. A row without year is a candidate
+    for the rows of the other source with the same normalized title, whatever their year. The candidates are scored with
+    `title_similarity` on the normalized titles and the pairs above `threshold` are matched one to
+    one, best score (then closest year) first.
+
+    Arguments:
+        left_titles: the titles of the first source
+        left_years: the release years of the first source, see `get_release_year`
+        right_titles: the titles of the second source
+        right_years: the release years of the second source
+        threshold: the minimum similarity of a match
+        year_tolerance: the maximum difference between the release years of a match
+
+    Returns:
+        The match table, a DataFrame with the positions of the matched rows ("left", "right"),
+        their titles ("left_title", "right_title"), the difference between their release years
+        ("year_difference") and the similarity of their normalized titles ("score")
+    """
+    left_normalized = normalize_title(left_titles)
+    right_normalized = normalize_title(right_titles)
+
+    left_blocks = get_blocks(left_normalized, left_years)
+    right_blocks = get_blocks(right_normalized, right_years)
+
+    # Exact titles where one of the rows has no year, the year is not compared
+    left_exact = left_blocks["block"].str.startswith("title:")
+    right_exact = right_blocks["block"].str.startswith("title:")
+    exact_candidates = pd.merge(
+        left_blocks[left_exact], right_blocks[right_exact], on="block", suffixes=("_left", "_right")
+    )
+    exact_candidates = exact_candidates[
+        exact_candidates["year_left"].isna() | exact_candidates["year_right"].isna()
+    ]
+    left_blocks = left_blocks[~left_exact]
+    right_blocks = right_blocks[~right_exact]
+
+    # Shift the right years to block together the years within the tolerance
+    right_blocks = pd.concat(
+        [
+            right_blocks.assign(year=right_blocks["year"] + shift)
+            for shift in range(-year_tolerance, year_tolerance + 1)
+        ]
+        if year_tolerance > 0
+        else [right_blocks],
+        ignore_index=True,
+    )
+    left_blocks["year"] = left_blocks["year"].fillna(-1)
+    right_blocks["year"] = right_blocks["year"].fillna(-1)
+
+    candidates = (
+        pd.concat(
+            [
+                pd.merge(
+                    left_blocks,
+                    right_blocks,
+                    on=["block", "year"],
+                    suffixes=("_left", "_right"),
+                ),
+                exact_candidates,
+            ]
+        )[["position_left", "position_right"]]
+        .drop_duplicates()
+        .rename(columns={"position_left": "left", "position_right": "right"})
+    )
+
+    left_keys = left_normalized.values[candidates["left"].values]
+    right_keys = right_normalized.values[candidates["right"].values]
+    candidates["score"] = [
+        title_similarity(left_key, right_key, threshold)
+        for left_key, right_key in zip(left_keys, right_keys)
+    ]
+    candidates["year_difference"] = np.abs(
+        left_years.values[candidates["left"].values]
+        - right_years.values[candidates["right"].values]
+    )
+
+    matches = candidates[candidates["score"] >= threshold].sort_values(
+        ["score", "year_difference"], ascending=[False, True], kind="stable"
+    )
+
+    # Greedy one to one assignment: keep the best pair of each row of both sources
+    matched_left = set()
+    matched_right = set()
+    keep = []
+    for left, right in zip(matches["left"].values, matches["right"].values):
+        keep.append(left not in matched_left and right not in matched_right)
+        if keep[-1]:
+            matched_left.add(left)
+            matched_right.add(right)
+    matches = matches[np.array(keep, dtype=bool)]
+
+    matches["left_title"] = left_titles.values[matches["left"].values]
+    matches["right_title"] = right_titles.values[matches["right"].values]
+    return matches[
+        ["left", "right", "left_title", "right_title", "year_difference", "score"]
+    ].reset_index(drop=True)
+
+
+def merge_on_titles(
+    left,
+    right,
+    suffixes=("_original", "_additional"),
+    threshold=0.9,
+    year_tolerance=1,
+    release_date_column="release_date",
+):
+    """
+    Outer merge of two DataFrames on their matched titles, the fuzzy counterpart of
+    `pd.merge(left, right, on="title", how="outer", suffixes=suffixes)`.
+
+    Unlike the exact merge, a movie is merged with at most one movie of the other source, and two
+    movies with the same title released in different years are kept apart.
+
+    Arguments:
+        left: the first DataFrame, with a "title" column and a release date column
+        right: the second DataFrame, with the same columns
+        suffixes: the suffixes of the overlapping columns
+        threshold: the minimum similarity of a match, see `match_titles`
+        year_tolerance: the maximum difference between the release years of a match
+        release_date_column: the column holding the release dates or years
+
+    Returns:
+        A tuple (merged DataFrame, match table), the title of a merged movie is the one of `left`
+    """
+    matches = match_titles(
+        left["title"],
+        get_release_year(left[release_date_column]),
+        right["title"],
+        get_release_year(right[release_date_column]),
+        threshold=threshold,
+        year_tolerance=year_tolerance,
+    )
+
+    # Matched rows share the key of their left row, the others get a key of their own
+    left_keys = np.arange(len(left))
+    right_keys = np.arange(len(left), len(left) + len(right))
+    right_keys[matches["right"].values] = matches["left"].values
+
+    left = left.assign(match_key=left_keys)
+    right = right.rename(columns={"title": "title_matched"}).assign(match_key=right_keys)
+
+    merged = pd.merge(left, right, on="match_key", how="outer", suffixes=suffixes)
+    merged["title"] = merged["title"].combine_first(merged["title_matched"])
+    merged = merged.drop(columns=["match_key", "title_matched"])
+
+    return merged, matches
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import random
+from types import SimpleNamespace
+
+from tqdm import tqdm
+
+
+def row_key(prompt, title, year, plot):
+    """
+    Compute the key identifying the query of a movie, used to resume an interrupted enrichment.
+
+    Arguments:
+        prompt: the prompt given to the model
+        title: the title of the movie
+        year: the release year of the movie
+        plot: the plot of the movie
+
+    Returns:
+        The hexadecimal SHA-256 hash of the four values
+    """
+    payload = json.dumps([prompt, str(title), str(year), str(plot)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JsonlStore:
+    """
+    Append-only JSONL file holding one record per enriched movie.
+
+    The records already in the file are loaded when the store is opened, so the rows enriched by a
+    previous run are skipped. Each record is flushed as soon as it is appended.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    # The last line may be truncated if a previous run was killed while writing
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.records[record["key"]] = record
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def append(self, record):
+        self.records[record["key"]] = record
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class AdaptiveRateLimiter:
+    """
+    Asynchronous rate limiter spacing the requests, driven by the 429 answers of the API.
+
+    Every 429 doubles the interval between two requests and pauses all of them for the duration
+    given by its Retry-After header. Every success shrinks the interval back towards `min_interval`.
+    """
+
+    def __init__(self, min_interval=0.0, max_interval=10.0, default_retry_after=1.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_retry_after = default_retry_after
+        self.interval = min_interval
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Wait until the next request can be sent.
+        """
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+    def slow_down(self, retry_after=None):
+        self.interval = min(self.max_interval, max(2 * self.interval, 0.05))
+        pause = retry_after if retry_after is not None else self.default_retry_after
+        self.next_time = max(self.next_time, time.monotonic() + pause)
+
+    def speed_up(self):
+        self.interval = max(self.min_interval, 0.95 * self.interval)
+
+
+def get_status_code(exception):
+    return getattr(exception, "status_code", None)
+
+
+# Errors of the OpenAI client raised when the request did not get an answer (timeouts included),
+# matched by name so this module does not depend on `openai`
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+
+def is_transient(exception):
+    """
+    Whether a failed request is worth retrying: rate limit (429), request timeout (408), server
+    error (5xx), timeout or connection error. Other errors (bad request, authentication, content
+    filter, ...) would fail the same way again.
+    """
+    status_code = get_status_code(exception)
+    if status_code is not None:
+        return status_code in (408, 429) or status_code >= 500
+    if isinstance(exception, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exception).__mro__)
+
+
+def get_retry_after(exception):
+    """
+    Read the Retry-After header (in seconds) of a failed request, None if it is missing.
+    """
+    headers = getattr(getattr(exception, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EnrichmentEngine:
+    """
+    Asynchronous engine querying the LLM for every movie of a DataFrame.
+
+    Arguments:
+        client: an asynchronous OpenAI client (`AsyncAzureOpenAI`) or a stand-in such as `FakeChatClient`
+        model_name: the name of the model
+        store: the `JsonlStore` receiving the answers
+        max_concurrency: the maximum number of requests in flight
+        max_retries: the number of retries of a failed request
+        backoff: the delay before the first retry of a transient failure (other than 429) in seconds
+        token_budget: the maximum number of tokens to spend, no new request is sent once it is
+                      reached. None for no limit.
+        rate_limiter: the `AdaptiveRateLimiter` to use, a default one is created if None
+        cache: a `ResponseCache` checked before each request and filled with the answers, or None
+    """
+
+    def __init__(
+        self,
+        client,
+        model_name,
+        store,
+        max_concurrency=12,
+        max_retries=5,
+        backoff=1.0,
+        token_budget=None,
+        rate_limiter=None,
+        cache=None,
+    ):
+        self.client = client
+        self.model_name = model_name
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.token_budget = token_budget
+        self.rate_limiter = rate_limiter if rate_limiter is not None else AdaptiveRateLimiter()
+        self.cache = cache
+        self.used_tokens = 0
+        self.nb_failures = 0
+
+    def budget_exhausted(self):
+        return self.token_budget is not None and self.used_tokens >= self.token_budget
+
+    async def complete(self, query):
+        """
+        Send a query to the model, retrying on transient failures (see `is_transient`).
+
+        Returns:
+            A tuple (answer, number of tokens used), answer is None if every attempt failed
+
+        Raises:
+            Exception: the error of the client if it is not transient, without retrying
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[{"role": "user", "content": query}],
+                )
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                if get_status_code(exc) == 429:
+                    self.rate_limiter.slow_down(get_retry_after(exc))
+                elif attempt < self.max_retries:
+                    await asyncio.sleep(self.backoff * 2**attempt)
+                continue
+
+            self.rate_limiter.speed_up()
+            usage = getattr(response, "usage", None)
+            tokens = getattr(usage, "total_tokens", 0) or 0
+            return str(response.choices[0].message.content), tokens
+
+        return None, 0
+
+    async def enrich(self, index, key, query, progress):
+        output = self.cache.get(query, self.model_name) if self.cache is not None else None
+        tokens = 0
+        if output is None and not self.budget_exhausted():
+            try:
+                output, tokens = await self.complete(query)
+            except Exception as exc:
+                # A row the model refuses (bad request, content filter, ...) does not stop the
+                # others, it is left out of the store and queried again by the next run
+                tqdm.write(f"Row {index} failed: {exc!r}")
+                output, tokens = None, 0
+            self.used_tokens += tokens
+            if output is None:
+                self.nb_failures += 1
+            elif self.cache is not None:
+                self.cache.put(query, self.model_name, output)
+        if output is not None:
+            self.store.append({"key": key, "index": index, "output": output, "tokens": tokens})
+        progress.update(1)
+
+    async def run(self, queries):
+        """
+        Enrich the given queries, skipping the ones already in the store.
+
+        Arguments:
+            queries: a list of tuples (index, key, query)
+        """
+        pending = [(index, key, query) for index, key, query in queries if key not in self.store]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded_enrich(index, key, query, progress):
+            async with semaphore:
+                await self.enrich(index, key, query, progress)
+
+        with tqdm(total=len(pending), desc="Processing rows") as progress:
+            await asyncio.gather(
+                *(bounded_enrich(index, key, query, progress) for index, key, query in pending)
+            )
+
+
+class FakeRateLimitError(Exception):
+    """
+    Error raised by `FakeChatClient`, shaped like `openai.RateLimitError`.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Rate limit reached")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class FakeChatClient:
+    """
+    Offline stand-in for `AsyncAzureOpenAI`, exposing `client.chat.completions.create`.
+
+    Arguments:
+        answer: a function mapping a query to the answer of the fake model
+        rate_limit_rate: the probability that a request gets a 429 answer
+        retry_after: the Retry-After duration of the 429 answers in seconds
+        latency: the duration of a request in seconds
+        seed: the seed of the 429 answers
+    """
+
+    def __init__(self, answer, rate_limit_rate=0.0, retry_after=0.01, latency=0.0, seed=42):
+        self.answer = answer
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.nb_requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages):
+        self.nb_requests += 1
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.rate_limit_rate:
+            raise FakeRateLimitError(self.retry_after)
+        content = self.answer(messages[-1]["content"])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(total_tokens=len(content.split())),
+        )
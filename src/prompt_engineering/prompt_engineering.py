@@ -1,24 +1,22 @@
 import os
-import glob
+import asyncio
 import pickle
 
 import pandas as pd
-from tqdm import tqdm
-from openai import AzureOpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from src.utils.helpers import *
 from src.utils.constants import *
+from src.utils.artifacts import load_artifact
+from src.prompt_engineering.enrichment import EnrichmentEngine, JsonlStore, row_key
+from src.prompt_engineering.response_cache import ResponseCache
 
 
 def create_query_movie(prompt, name, year, plot):
     return prompt + "\nname: " + name + "\nyear: " + year + "\nplot: " + plot
 
 
-if __name__ == "__main__":
-    movies_df = pd.read_csv(DATA_FOLDER_PREPROCESSED + "merged_movies.csv")
-
-    print(movies_df.shape)
+def create_client():
+    from openai import AsyncAzureOpenAI
 
     endpoint = os.environ.get("OAI_ENDPOINT")
     key = os.environ.get("OAI_KEY")
@@ -28,63 +26,98 @@ if __name__ == "__main__":
     # endpoint = keyring.get_password("AzureOpenAI", "endpoint4omini")
     # key = keyring.get_password("AzureOpenAI", "key4omini")
 
-    # print(endpoint)
-    # print(key)
-
-    model_name = "gpt-4o-mini"
-
-    client = AzureOpenAI(
+    return AsyncAzureOpenAI(
         azure_endpoint=endpoint, api_version="2024-08-01-preview", api_key=key
     )
 
-    with open("src/utils/prompt.txt", "r") as f:
+
+def create_gpt_outputs(
+    client=None,
+    model_name="gpt-4o-mini",
+    max_concurrency=12,
+    token_budget=None,
+    store_path=PROMPT_ENGINEERING_OUTPUTS,
+    cache_path=PROMPT_ENGINEERING_CACHE,
+    cache_max_bytes=None,
+):
+    """
+    Query the model for every movie of the merged dataset and save the answers, in the order of
+    the dataset, to `output4o.pkl`.
+
+    The answers are appended to a JSONL store keyed by a hash of (prompt, title, year, plot), so
+    a rerun only queries the movies that are new or whose prompt or plot changed. The model is
+    only called on a miss of the response cache, keyed on the full query and the model name, which
+    is saved to `cache_path` and can be copied to another machine.
+
+    Arguments:
+        client: an asynchronous OpenAI client, the Azure one configured with the `OAI_ENDPOINT`
+                and `OAI_KEY` environment variables is used if None
+        model_name: the name of the model
+        max_concurrency: the maximum number of requests in flight
+        token_budget: the maximum number of tokens to spend in this run, None for no limit
+        store_path: the path of the JSONL store
+        cache_path: the path of the exported response cache, None to disable the cache
+        cache_max_bytes: the maximum size of the response cache in bytes, None for no limit
+
+    Returns:
+        The list of the answers, an empty string for the movies that could not be enriched
+    """
+    movies_df = load_artifact("merged_movies")
+
+    print(movies_df.shape)
+
+    if client is None:
+        client = create_client()
+
+    with open(PROMPT_FILE, "r") as f:
         prompt = f.read()
 
-    def process_row(row, index):
-        query = create_query_movie(
-            prompt, row["title"], str(row["release_date"]), row["plot_summary"]
+    queries = [
+        (
+            index,
+            row_key(prompt, row["title"], row["release_date"], row["plot_summary"]),
+            create_query_movie(
+                prompt, row["title"], str(row["release_date"]), row["plot_summary"]
+            ),
         )
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "user", "content": query},
-            ],
+        for index, row in movies_df.iterrows()
+    ]
+
+    cache = None
+    if cache_path is not None:
+        cache = ResponseCache(max_bytes=cache_max_bytes)
+        if os.path.exists(cache_path):
+            cache.import_entries(cache_path)
+
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+    with JsonlStore(store_path) as store:
+        engine = EnrichmentEngine(
+            client,
+            model_name,
+            store,
+            max_concurrency=max_concurrency,
+            token_budget=token_budget,
+            cache=cache,
         )
-        output = str(response.choices[0].message.content)
-        # Write output to a file
-        with open(
-            f"{PROMPT_ENGINEERING}output_{index}.txt", "w", encoding="utf-8"
-        ) as f:
-            f.write(output)
-        return output
-
-    responses = []
-    with ThreadPoolExecutor(max_workers=12) as executor:
-        futures = {
-            executor.submit(process_row, row, index): index
-            for index, row in movies_df.iterrows()
-        }
-
-        # Use tqdm to track progress
-        for future in tqdm(
-            as_completed(futures), total=len(futures), desc="Processing rows"
-        ):
-            try:
-                data = future.result()
-                responses.append(data)
-            except Exception as exc:
-                print(f"Generated an exception: {exc}")
-
-    output_files = sorted(
-        glob.glob(PROMPT_ENGINEERING + "output_*.txt"),
-        key=lambda x: int(x.split("_")[1].split(".txt")[0]),
-    )
+        asyncio.run(engine.run(queries))
+
+        output_4o = [
+            store.get(key)["output"] if key in store else "" for _, key, _ in queries
+        ]
 
-    output_4o = []
+    nb_missing = sum(output == "" for output in output_4o)
+    if nb_missing > 0:
+        print(f"{nb_missing} movies could not be enriched, rerun to query them again")
+    print(f"{engine.used_tokens} tokens used")
 
-    # read all the output files
-    for file in output_files:
-        with open(file, "r") as f:
-            output_4o.append(f.read())
+    if cache is not None:
+        cache.export_entries(cache_path)
+        print(f"Response cache: {cache.stats()}")
 
     pickle.dump(output_4o, open(DATA_FOLDER_PREPROCESSED + "output4o.pkl", "wb"))
+
+    return output_4o
+
+
+if __name__ == "__main__":
+    create_gpt_outputs()
@@ -0,0 +1,110 @@
+import os
+import gzip
+import json
+import hashlib
+from collections import OrderedDict
+
+
+def query_hash(query, model_name):
+    """
+    Compute the content address of a query: the SHA-256 hash of the model name and the full query
+    built by `create_query_movie`.
+    """
+    return hashlib.sha256((model_name + "\0" + query).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of the model answers, bounded with a least recently used eviction.
+
+    Arguments:
+        max_entries: the maximum number of answers kept, None for no limit
+        max_bytes: the maximum total size of the answers kept in bytes, None for no limit
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nb_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, query, model_name):
+        """
+        Returns:
+            The cached answer of the query, or None if it is not cached
+        """
+        key = query_hash(query, model_name)
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, query, model_name, response):
+        self.put_key(query_hash(query, model_name), response)
+
+    def put_key(self, key, response):
+        if key in self.entries:
+            self.nb_bytes -= len(self.entries.pop(key).encode("utf-8"))
+        self.entries[key] = response
+        self.nb_bytes += len(response.encode("utf-8"))
+        self.evict()
+
+    def evict(self):
+        while self.entries and (
+            (self.max_entries is not None and len(self.entries) > self.max_entries)
+            or (self.max_bytes is not None and self.nb_bytes > self.max_bytes)
+        ):
+            _, response = self.entries.popitem(last=False)
+            self.nb_bytes -= len(response.encode("utf-8"))
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Returns:
+            A dict with the number of hits, misses and evictions, the hit rate and the size of the cache
+        """
+        nb_lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / nb_lookups if nb_lookups > 0 else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.nb_bytes,
+        }
+
+    def export_entries(self, path):
+        """
+        Write the cache to a gzipped JSONL file, one {"key", "response"} object per line from the
+        least to the most recently used, that can be imported on another machine.
+        """
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            for key, response in self.entries.items():
+                f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def import_entries(self, path):
+        """
+        Add the answers of a file written by `export_entries`, they become the most recently used.
+
+        Returns:
+            The number of imported answers
+        """
+        nb_imported = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.put_key(entry["key"], entry["response"])
+                nb_imported += 1
+        return nb_imported
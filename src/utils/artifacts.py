@@ -0,0 +1,159 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.constants import *
+
+STRING_LIST = pa.list_(pa.string())
+
+# Columns added by the GPT enhancement, see `gpt_4o_data_enhancement.py`
+GPT_LIST_COLUMNS = [
+    "character_western_bloc_representation",
+    "character_eastern_bloc_representation",
+    "western_bloc_values",
+    "eastern_bloc_values",
+    "theme",
+]
+
+MERGED_MOVIES_SCHEMA = pa.schema(
+    [
+        ("wikipedia_id", pa.float64()),
+        ("freebase_id", pa.string()),
+        ("title", pa.string()),
+        ("languages", STRING_LIST),
+        ("countries", STRING_LIST),
+        ("genres", STRING_LIST),
+        ("keywords", STRING_LIST),
+        ("release_date", pa.int64()),
+        ("runtime", pa.float64()),
+        ("plot_summary", pa.string()),
+    ]
+)
+
+# Declared schema of the artifact written by each stage of the pipeline
+ARTIFACT_SCHEMAS = {
+    "movie_summaries": pa.schema(
+        [
+            ("wikipedia_id", pa.int64()),
+            ("freebase_id", pa.string()),
+            ("title", pa.string()),
+            # Microseconds like `convert_to_datetime_series`, the CMU metadata has dates before 1677
+            ("release_date", pa.timestamp("us")),
+            ("revenue", pa.float64()),
+            ("runtime", pa.float64()),
+            ("languages", STRING_LIST),
+            ("countries", STRING_LIST),
+            ("genres", STRING_LIST),
+            ("plot_summary", pa.string()),
+        ]
+    ),
+    "merged_movies": MERGED_MOVIES_SCHEMA,
+    "v2_movies_cleaned": pa.schema(
+        list(MERGED_MOVIES_SCHEMA)
+        + [("cold_war_side", pa.string())]
+        + [(column, STRING_LIST) for column in GPT_LIST_COLUMNS]
+    ),
+    "preprocessed_movies": pa.schema(
+        [
+            ("title", pa.string()),
+            ("languages", STRING_LIST),
+            ("countries", STRING_LIST),
+            ("genres", STRING_LIST),
+            ("release_date", pa.int64()),
+            ("cold_war_side", pa.string()),
+        ]
+        + [(column, STRING_LIST) for column in GPT_LIST_COLUMNS]
+    ),
+}
+
+
+def get_artifact_path(stage):
+    return DATA_FOLDER_PREPROCESSED + stage + ".parquet"
+
+
+def to_list_cells(series):
+    """
+    Prepare a list column for Arrow: lists, sets and tuples become lists, the other cells
+    (missing values, "None" answers of a failed GPT parsing, ...) become null.
+    """
+    return pd.Series(
+        [list(x) if isinstance(x, (list, set, tuple)) else None for x in series],
+        index=series.index,
+        dtype=object,
+    )
+
+
+def save_artifact(df, stage):
+    """
+    Save the output of a pipeline stage to Parquet, validated against its declared schema.
+
+    Unlike a CSV, list columns are stored as Arrow lists and read back as Python lists.
+
+    Arguments:
+        df: the DataFrame produced by the stage
+        stage: the name of the stage, a key of `ARTIFACT_SCHEMAS`
+
+    Raises:
+        ValueError: if the columns of `df` are not the declared ones or cannot be cast to their type
+    """
+    schema = ARTIFACT_SCHEMAS[stage]
+
+    if set(df.columns) != set(schema.names):
+        raise ValueError(
+            f"Columns of the {stage} artifact do not match its schema: "
+            f"missing {sorted(set(schema.names) - set(df.columns))}, "
+            f"undeclared {sorted(set(df.columns) - set(schema.names))}"
+        )
+
+    df = df[schema.names].copy()
+    for field in schema:
+        if field.type == STRING_LIST:
+            df[field.name] = to_list_cells(df[field.name])
+
+    try:
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"The {stage} artifact does not match its schema: {e}") from e
+
+    path = get_artifact_path(stage)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def load_artifact(stage, columns=None):
+    """
+    Load the output of a pipeline stage saved with `save_artifact`.
+
+    Arguments:
+        stage: the name of the stage, a key of `ARTIFACT_SCHEMAS`
+        columns: the columns to load, all of them if None
+
+    Returns:
+        The DataFrame of the stage, its list columns hold Python lists and NaN for missing values
+
+    Raises:
+        ValueError: if the file does not match the declared schema of the stage
+    """
+    schema = ARTIFACT_SCHEMAS[stage]
+    table = pq.read_table(get_artifact_path(stage), columns=columns)
+
+    for field in table.schema:
+        if field.name not in schema.names or schema.field(field.name).type != field.type:
+            raise ValueError(
+                f"Column {field.name} ({field.type}) of the {stage} artifact does not match its schema"
+            )
+
+    list_columns = [field.name for field in table.schema if field.type == STRING_LIST]
+    df = table.select(
+        [name for name in table.schema.names if name not in list_columns]
+    ).to_pandas()
+    for column in list_columns:
+        df[column] = pd.Series(
+            [x if x is not None else np.nan for x in table.column(column).to_pylist()],
+            dtype=object,
+        )
+
+    return df[table.schema.names]
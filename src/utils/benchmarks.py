@@ -0,0 +1,386 @@
+import os
+import time
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from src.utils.constants import *
+from src.utils.helpers import *
+
+
+def time_function(function, *args, repeat=3):
+    """
+    Time a function call and keep the best run.
+
+    Arguments:
+        function: the function to time
+        args: the arguments given to the function
+        repeat: the number of runs
+
+    Returns:
+        A tuple (best time in seconds, result of the last run)
+    """
+    best_time = np.inf
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best_time = min(best_time, time.perf_counter() - start)
+    return best_time, result
+
+
+def load_date_columns(nb_rows=450_000, seed=42):
+    """
+    Load the `release_date` and `actor_dob` columns of the CMU character metadata, or generate
+    a synthetic sample with the same mix of formats if the file has not been downloaded.
+
+    Arguments:
+        nb_rows: the number of rows of the synthetic sample
+        seed: the seed of the synthetic sample
+
+    Returns:
+        A dict mapping the column names to Series of date strings
+    """
+    if os.path.exists(CMU_CHARACTER):
+        df_characters = pd.read_table(
+            CMU_CHARACTER, header=None, usecols=[2, 4], names=["release_date", "actor_dob"]
+        )
+        return {column: df_characters[column] for column in df_characters.columns}
+
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1900, 2012, nb_rows).astype(str)
+    months = np.char.zfill(rng.integers(1, 13, nb_rows).astype(str), 2)
+    days = np.char.zfill(rng.integers(1, 29, nb_rows).astype(str), 2)
+    full_dates = np.char.add(np.char.add(np.char.add(years, "-"), np.char.add(months, "-")), days)
+    year_months = np.char.add(np.char.add(years, "-"), months)
+
+    # Roughly the proportions of formats found in character.metadata.tsv
+    formats = rng.choice(4, nb_rows, p=[0.6, 0.25, 0.05, 0.1])
+    dates = np.where(formats == 0, full_dates, np.where(formats == 1, years, year_months))
+    dates = pd.Series(dates, dtype=object)
+    dates[formats == 3] = np.nan
+    # A date out of the nanosecond range, as found in the CMU release dates
+    dates[0] = "1010-12-02"
+    # The year 0, rejected by `strptime`
+    dates[1] = "0000"
+
+    return {"release_date": dates, "actor_dob": dates.sample(frac=1, random_state=seed, ignore_index=True)}
+
+
+def benchmark_date_parsing(repeat=3):
+    """
+    Compare the row-wise `convert_to_datetime` with the vectorized `convert_to_datetime_series`
+    on the date columns of the CMU character metadata.
+
+    Arguments:
+        repeat: the number of runs of each method, the best one is kept
+
+    Returns:
+        A DataFrame with one row per column and the timings of both methods side by side
+    """
+    results = []
+    for column, date_series in load_date_columns().items():
+        old_time, old_dates = time_function(
+            lambda s: pd.to_datetime(s.apply(convert_to_datetime), errors="coerce"),
+            date_series,
+            repeat=repeat,
+        )
+        new_time, new_dates = time_function(convert_to_datetime_series, date_series, repeat=repeat)
+
+        results.append(
+            {
+                "column": column,
+                "rows": len(date_series),
+                "convert_to_datetime (s)": old_time,
+                "convert_to_datetime_series (s)": new_time,
+                "speedup": old_time / new_time,
+                # Compare the values only, the datetime resolution may differ between pandas versions
+                "identical": bool(
+                    ((old_dates == new_dates) | (old_dates.isna() & new_dates.isna())).all()
+                ),
+            }
+        )
+
+    return pd.DataFrame(results)
+
+
+def combine_columns_row_wise(df, name_1, name_2):
+    """
+    Former row-wise implementation of `combine_columns`, kept as the reference of the benchmark.
+    """
+    combined = df.apply(
+        lambda row: list(
+            set(
+                (row[name_1] if isinstance(row[name_1], list) else [])
+                + (row[name_2] if isinstance(row[name_2], list) else [])
+            )
+        ),
+        axis=1,
+    )
+    return combined.apply(lambda x: np.nan if len(x) == 0 else x)
+
+
+def benchmark_list_union(nb_rows=150_000, repeat=3, seed=42):
+    """
+    Compare the row-wise union of two list columns with `union_list_columns` on a synthetic
+    frame shaped like the outer-merged movies (a third of the cells missing on each side).
+
+    Arguments:
+        nb_rows: the number of rows of the synthetic frame
+        repeat: the number of runs of each method, the best one is kept
+        seed: the seed of the synthetic frame
+
+    Returns:
+        A DataFrame with the timings of both methods side by side
+    """
+    rng = np.random.default_rng(seed)
+    genres = np.array([f"genre {i}" for i in range(40)])
+
+    def random_lists():
+        lengths = rng.integers(1, 5, nb_rows)
+        lists = pd.Series([list(rng.choice(genres, length)) for length in lengths])
+        return lists.where(rng.random(nb_rows) > 0.33)
+
+    df = pd.DataFrame({"genres_original": random_lists(), "genres_additional": random_lists()})
+
+    old_time, old_lists = time_function(
+        combine_columns_row_wise, df, "genres_original", "genres_additional", repeat=repeat
+    )
+    new_time, new_lists = time_function(
+        union_list_columns, df["genres_original"], df["genres_additional"], repeat=repeat
+    )
+
+    # The order inside the lists is arbitrary in the row-wise version
+    identical = all(
+        set(old) == set(new) if isinstance(old, list) else not isinstance(new, list)
+        for old, new in zip(old_lists, new_lists)
+    )
+
+    return pd.DataFrame(
+        [
+            {
+                "rows": nb_rows,
+                "combine_columns row-wise (s)": old_time,
+                "union_list_columns (s)": new_time,
+                "speedup": old_time / new_time,
+                "identical": identical,
+            }
+        ]
+    )
+
+
+def benchmark_tmdb_decoding(nb_rows=45_000, repeat=3, seed=42):
+    """
+    Compare the former double `ast.literal_eval` decoding of the TMDb genres with
+    `decode_name_list_column` on a synthetic column shaped like `movies_metadata.csv`.
+
+    Arguments:
+        nb_rows: the number of rows of the synthetic column
+        repeat: the number of runs of each method, the best one is kept
+        seed: the seed of the synthetic column
+
+    Returns:
+        A DataFrame with the timings of both methods side by side
+    """
+    rng = np.random.default_rng(seed)
+    genres = [{"id": i, "name": f"Genre {i}"} for i in range(20)]
+    cells = [
+        str([genres[i] for i in sorted(rng.choice(20, length, replace=False))])
+        for length in rng.integers(0, 4, nb_rows)
+    ]
+    series = pd.Series(cells).where(rng.random(nb_rows) > 0.05)
+
+    old_time, old_names = time_function(
+        lambda s: s.apply(
+            lambda row: (
+                [item["name"] for item in ast.literal_eval(row)]
+                if pd.notnull(row) and ast.literal_eval(row)
+                else np.nan
+            )
+        ),
+        series,
+        repeat=repeat,
+    )
+    new_time, new_names = time_function(decode_name_list_column, series, repeat=repeat)
+
+    return pd.DataFrame(
+        [
+            {
+                "rows": nb_rows,
+                "literal_eval (s)": old_time,
+                "decode_name_list_column (s)": new_time,
+                "speedup": old_time / new_time,
+                "identical": old_names.equals(new_names),
+            }
+        ]
+    )
+
+
+def compute_counts_loop(movies_df, min_nb_movies=0, min_nb_collab=0):
+    country_film_count = Counter()
+    collaboration_count = Counter()
+
+    # Count for the number of movies produced by each country and the number of collaboration 
+    # between every tuple of countries if their is.
+    for countries in movies_df['countries']:
+        country_film_count.update(countries)
+        for pair in combinations(countries, 2):
+            collaboration_count[tuple(sorted(pair))] += 1
+    
+    # Filter to keep only the countries that have produced a minimum number of movies
+    country_film_count = {k: v for k, v in country_film_count.items() if v > min_nb_movies}
+
+    # Apply a root scale to reduce the divergence between the values
+    root_film_count = {country: np.sqrt(count) for country, count in country_film_count.items()}
+
+    # Get the remaining countries
+    countries = list(root_film_count.keys())
+
+    # Filter to keep only the collaboration that have happened more than a minimum number of time
+    # and we make sure we have the same countries than the one in our `countries` list 
+    collaboration_count = {k: v for k, v in collaboration_count.items() if v > min_nb_collab}
+    collaboration_count = {k: v for k, v in collaboration_count.items() if k[0] in countries and k[1] in countries}
+
+    return countries, root_film_count, collaboration_count
+
+def benchmark_coproduction_counts(nb_movies=30_000, nb_countries=140, repeat=3, seed=42):
+    """
+    Compare `compute_counts_loop` with `compute_counts`, the sparse co-production matrix.
+    """
+    from src.utils.collab_viz_helpers import build_coproduction_matrix, compute_counts
+
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Country {i}" for i in range(nb_countries)])
+    weights = 1 / np.arange(1, nb_countries + 1)
+    movies_df = pd.DataFrame(
+        {
+            "countries": [
+                list(rng.choice(names, size=rng.integers(1, 5), replace=False, p=weights / weights.sum()))
+                for _ in range(nb_movies)
+            ]
+        }
+    )
+
+    rows = []
+    for min_nb_movies, min_nb_collab in [(0, 0), (10, 5)]:
+        old_time, old_counts = time_function(
+            compute_counts_loop, movies_df, min_nb_movies, min_nb_collab, repeat=repeat
+        )
+        new_time, new_counts = time_function(
+            compute_counts, movies_df, min_nb_movies, min_nb_collab, repeat=repeat
+        )
+        coproduction = build_coproduction_matrix(movies_df)
+        reused_time, _ = time_function(
+            compute_counts, movies_df, min_nb_movies, min_nb_collab, coproduction, repeat=repeat
+        )
+        rows.append(
+            {
+                "movies": nb_movies,
+                "thresholds": (min_nb_movies, min_nb_collab),
+                "combinations (s)": old_time,
+                "sparse MᵀM (s)": new_time,
+                "matrix reused (s)": reused_time,
+                "speedup": old_time / new_time,
+                "identical": old_counts == new_counts,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def benchmark_edge_batching(nb_movies=30_000, repeat=3, seed=42):
+    """
+    Compare the figures of the collaboration map with one trace per edge and with the edges batched
+    by color and width (`bucket_edges`): number of traces, size of the JSON sent to the browser and
+    time to build and serialize the figure.
+    """
+    from src.analysis.collab_viz import StaticMap
+    from src.utils.collab_viz_helpers import COUNTRY_COORDS
+
+    rng = np.random.default_rng(seed)
+    names = np.array(list(COUNTRY_COORDS))
+    weights = 1 / np.arange(1, len(names) + 1)
+    movies_df = pd.DataFrame(
+        {
+            "countries": [
+                list(rng.choice(names, size=rng.integers(1, 5), replace=False, p=weights / weights.sum()))
+                for _ in range(nb_movies)
+            ],
+            "cold_war_side": rng.choice(["Western", "Eastern"], size=nb_movies),
+        }
+    )
+    graph = StaticMap(movies_df)
+
+    rows = []
+    for batched in [False, True]:
+        elapsed, figure_json = time_function(
+            lambda: graph.create_figure(batched=batched).to_json(), repeat=repeat
+        )
+        rows.append(
+            {
+                "edges": len(graph.collaboration_count),
+                "batched": batched,
+                "traces": len(graph.fig.data),
+                "JSON size (kB)": len(figure_json) / 1000,
+                "build + to_json (s)": elapsed,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def benchmark_lemmatization(nlp=None, nb_phrases=20_000, repeat=1, seed=42):
+    """
+    Compare the former loop `[nlp(s) for s in phrases]` with `TextNormalizer.tokens` on synthetic
+    phrases shaped like the themes (a few words, many repeated), and check that both give the same
+    tokens (lemma, is_stop, is_punct).
+
+    Arguments:
+        nlp: the spaCy pipeline, `en_core_web_sm` if None
+        nb_phrases: the number of phrases
+        repeat: the number of runs of each method, the best one is kept
+        seed: the seed of the synthetic phrases
+    """
+    import spacy
+    from src.utils.text_normalization import TextNormalizer
+
+    if nlp is None:
+        nlp = spacy.load("en_core_web_sm")
+    rng = np.random.default_rng(seed)
+    words = np.array(
+        ["the", "Cold", "War", "spies", "running", "agents", "of", "betrayal", "heroes'",
+         "sacrifices", "love", "propaganda", "K.G.B.", "officers", "nuclear", "fears", ",", "!"]
+    )
+    distinct = [" ".join(rng.choice(words, size=rng.integers(1, 5))) for _ in range(nb_phrases // 4)]
+    phrases = [distinct[position] for position in rng.integers(0, len(distinct), nb_phrases)]
+
+    def loop_tokens():
+        docs = [nlp(phrase) for phrase in phrases]
+        return [(token.lemma_, token.is_stop, token.is_punct) for doc in docs for token in doc]
+
+    old_time, old_tokens = time_function(loop_tokens, repeat=repeat)
+    # A new normalizer per run, the cache of a previous run would skip all the phrases
+    new_time, new_tokens = time_function(
+        lambda: TextNormalizer(nlp, cache_path=None).tokens(phrases), repeat=repeat
+    )
+
+    return pd.DataFrame(
+        [
+            {
+                "phrases": nb_phrases,
+                "nlp loop (s)": old_time,
+                "TextNormalizer (s)": new_time,
+                "speedup": old_time / new_time,
+                "identical": old_tokens == new_tokens,
+            }
+        ]
+    )
+
+
+if __name__ == "__main__":
+    print(benchmark_date_parsing().to_string(index=False))
+    print(benchmark_list_union().to_string(index=False))
+    print(benchmark_tmdb_decoding().to_string(index=False))
+    print(benchmark_coproduction_counts().to_string(index=False))
+    print(benchmark_edge_batching().to_string(index=False))
+    print(benchmark_lemmatization().to_string(index=False))
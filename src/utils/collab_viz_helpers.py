@@ -1,7 +1,9 @@
 import numpy as np
-from collections import Counter
-from itertools import combinations
+import pandas as pd
+import networkx as nx
+from scipy import sparse
 from src.utils.constants import *
+from src.utils.vocabulary import RaggedColumn
 
 # Have been generated with GPT
 COUNTRY_COORDS = {
@@ -139,7 +141,54 @@ COLOR_MAPPING = {'Western': f'rgb({COLOR_SCALE_RGB["Deep Blue"][0]}, {COLOR_SCAL
                  'None': f'rgb({NEUTRAL_COLORS_RGB["Neutral Light"][0]}, {NEUTRAL_COLORS_RGB["Neutral Light"][1]}, {NEUTRAL_COLORS_RGB["Neutral Light"][2]})', 
                  'Lack of data': f'rgb({DISTINCT_COLORS_RGB["Yellow"][0]}, {DISTINCT_COLORS_RGB["Yellow"][1]}, {DISTINCT_COLORS_RGB["Yellow"][2]})'}
 
-def assign_side(movies_df, countries, relevance_nb=10, relevance_diff=10, threshold=19):
+def compute_side_counts(movies_df):
+    """
+    Count, for every country, the movies it produced and the ones aligned with each Cold War side.
+
+    The counts of all the countries are computed in one pass: the sparse movie x country incidence
+    matrix (the inverted index from a country to its movies) is multiplied by the one-hot side of
+    the movies. The result can be computed once and given to `assign_side` for any threshold.
+
+    Parameters:
+        movies_df: A dataframe with the `countries` (lists of strings) and `cold_war_side` columns.
+
+    Returns:
+        A dataframe indexed by country with the columns 'Western', 'Eastern' and 'Total'.
+    """
+    countries = RaggedColumn.from_series(movies_df['countries'])
+    sides = movies_df['cold_war_side'].to_numpy()
+    tally = np.column_stack([sides == 'Western', sides == 'Eastern', np.ones(len(sides), dtype=bool)])
+
+    counts = countries.incidence_matrix().T @ tally.astype(np.int64)
+    return pd.DataFrame(counts, index=countries.vocabulary.terms, columns=['Western', 'Eastern', 'Total'])
+
+def side_from_counts(west_count, east_count, total_count, relevance_nb=10, relevance_diff=10, threshold=19):
+    """
+    Vectorized Cold War side rule of `assign_side`, applied to arrays of counts.
+
+    Returns:
+        An array of the sides ('Western', 'Eastern', 'None' or 'Lack of data').
+    """
+    west_count = np.asarray(west_count)
+    east_count = np.asarray(east_count)
+    total_count = np.asarray(total_count)
+    total_count_without_none = west_count + east_count
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage_difference = np.abs(west_count - east_count) / total_count_without_none * 100
+
+    return np.select(
+        [
+            total_count < relevance_nb,
+            total_count_without_none < relevance_diff,
+            (percentage_difference < threshold) | (west_count == east_count),
+            west_count > east_count,
+        ],
+        ['Lack of data', 'None', 'None', 'Western'],
+        default='Eastern',
+    ).astype(object)
+
+def assign_side(movies_df, countries, relevance_nb=10, relevance_diff=10, threshold=19, side_counts=None):
     """
     Assigns a Cold War side (Western, Eastern, or None) to each country based on the prevalence of films 
     aligned with each side in a dataset.
@@ -157,6 +206,8 @@ def assign_side(movies_df, countries, relevance_nb=10, relevance_diff=10, thresh
         countries: A list of country names for which the Cold War side alignment needs to be determined.
         threshold: The minimum percentage difference between the number of Western and Eastern aligned films 
                    required to classify a country as either 'Western' or 'Eastern'. Defaults to 19%.
+        side_counts: The output of `compute_side_counts(movies_df)`, computed if None. Pass it to avoid
+                     counting the movies again when the function is called several times.
 
     Returns:
         A dictionary where the keys are country names and the values are their assigned Cold War side.
@@ -166,57 +217,361 @@ def assign_side(movies_df, countries, relevance_nb=10, relevance_diff=10, thresh
         - The function calculates the percentage difference between the number of Western and Eastern aligned films 
           for each country and compares it to the threshold to determine the alignment.
         """
-    country_cold_war_side = {}
+    if side_counts is None:
+        side_counts = compute_side_counts(movies_df)
 
-    for country in countries:
-        # Get the 'cold_war_side' counts for the country in `movies`
-        sides = movies_df.loc[movies_df['countries'].apply(lambda x: country in x), 'cold_war_side'].values
-        west_count = (sides == 'Western').sum()
-        east_count = (sides == 'Eastern').sum()
-        total_count = len(sides)
-
-        total_count_without_none = west_count + east_count
-        if total_count < relevance_nb:
-            country_cold_war_side[country] = 'Lack of data'
-        elif total_count_without_none < relevance_diff and total_count >= relevance_nb:
-            country_cold_war_side[country] = 'None'
-        else:
-            # Calculate the percentage difference
-            percentage_difference = abs(west_count - east_count) / total_count_without_none * 100
-            
-            # Assign the corresponding side to the country
-            if percentage_difference < threshold or west_count == east_count:
-                country_cold_war_side[country] = 'None'
-            elif west_count > east_count:
-                country_cold_war_side[country] = 'Western'
-            elif west_count < east_count:
-                country_cold_war_side[country] = 'Eastern'
-    
-    return country_cold_war_side
-
-def compute_counts(movies_df, min_nb_movies=0, min_nb_collab=0):
-    country_film_count = Counter()
-    collaboration_count = Counter()
-
-    # Count for the number of movies produced by each country and the number of collaboration 
-    # between every tuple of countries if their is.
-    for countries in movies_df['countries']:
-        country_film_count.update(countries)
-        for pair in combinations(countries, 2):
-            collaboration_count[tuple(sorted(pair))] += 1
-    
-    # Filter to keep only the countries that have produced a minimum number of movies
-    country_film_count = {k: v for k, v in country_film_count.items() if v > min_nb_movies}
+    counts = side_counts.reindex(list(countries), fill_value=0)
+    sides = side_from_counts(counts['Western'].to_numpy(), counts['Eastern'].to_numpy(), counts['Total'].to_numpy(),
+                             relevance_nb, relevance_diff, threshold)
 
-    # Apply a root scale to reduce the divergence between the values
-    root_film_count = {country: np.sqrt(count) for country, count in country_film_count.items()}
+    return dict(zip(counts.index, sides))
+
+def build_coproduction_matrix(movies_df):
+    """
+    Build the co-production matrix of the countries.
+
+    With M the sparse movie x country incidence matrix, the co-production matrix is C = MᵀM: C[i, j]
+    is the number of movies co-produced by the countries i and j, and the diagonal holds the number
+    of movies produced by each country.
+
+    Parameters:
+        movies_df: A dataframe with a `countries` column of lists of strings.
+
+    Returns:
+        A tuple (countries, matrix): the countries in the order of their first appearance and the
+        symmetric `scipy.sparse.csr_matrix` C indexed in this order.
+    """
+    countries = RaggedColumn.from_series(movies_df['countries'])
+    order = countries.first_occurrences()
+    incidence = countries.incidence_matrix(binary=False)[:, order]
+
+    coproduction = (incidence.T @ incidence).tocsr()
+    coproduction.setdiag(np.asarray(incidence.sum(axis=0)).ravel())
+    return countries.vocabulary.decode(order).tolist(), coproduction
+
+def filter_coproduction_matrix(countries, coproduction, min_nb_movies=0, min_nb_collab=0):
+    """
+    Keep the countries that produced more than `min_nb_movies` movies and the collaborations that
+    happened more than `min_nb_collab` times between them.
 
-    # Get the remaining countries
-    countries = list(root_film_count.keys())
+    Returns:
+        A tuple (countries, film counts, collaborations): the kept countries, their number of movies
+        and the `scipy.sparse.coo_matrix` of their collaborations (strict upper triangle).
+    """
+    film_count = coproduction.diagonal()
+    kept = np.flatnonzero(film_count > min_nb_movies)
+
+    collaborations = sparse.triu(coproduction[kept][:, kept], k=1).tocoo()
+    mask = collaborations.data > min_nb_collab
+    collaborations = sparse.coo_matrix(
+        (collaborations.data[mask], (collaborations.row[mask], collaborations.col[mask])),
+        shape=collaborations.shape,
+    )
+    return [countries[i] for i in kept], film_count[kept], collaborations
+
+def compute_counts(movies_df, min_nb_movies=0, min_nb_collab=0, coproduction=None):
+    """
+    Count the movies produced by each country and the co-productions between the countries.
 
-    # Filter to keep only the collaboration that have happened more than a minimum number of time
-    # and we make sure we have the same countries than the one in our `countries` list 
-    collaboration_count = {k: v for k, v in collaboration_count.items() if v > min_nb_collab}
-    collaboration_count = {k: v for k, v in collaboration_count.items() if k[0] in countries and k[1] in countries}
+    Parameters:
+        movies_df: A dataframe with a `countries` column of lists of strings.
+        min_nb_movies: Only the countries that produced more movies are kept.
+        min_nb_collab: Only the collaborations that happened more times are kept.
+        coproduction: The output of `build_coproduction_matrix(movies_df)`, computed if None. Pass it
+                      to avoid building the matrix again when the function is called several times.
+
+    Returns:
+        A tuple (countries, root_film_count, collaboration_count): the kept countries in the order of
+        their first appearance, a dict of the square root of their number of movies and a dict of the
+        number of co-productions of each pair of countries (a tuple sorted alphabetically).
+    """
+    if coproduction is None:
+        coproduction = build_coproduction_matrix(movies_df)
+
+    countries, film_count, collaborations = filter_coproduction_matrix(*coproduction, min_nb_movies, min_nb_collab)
+
+    # Apply a root scale to reduce the divergence between the values
+    root_film_count = {country: np.sqrt(count) for country, count in zip(countries, film_count)}
+
+    collaboration_count = {
+        tuple(sorted((countries[i], countries[j]))): int(count)
+        for i, j, count in zip(collaborations.row, collaborations.col, collaborations.data)
+    }
 
     return countries, root_film_count, collaboration_count
+
+def get_edge_color(side, weight, max_collaboration, neutral_color):
+    """
+    Color of an edge between two countries of the same Cold War side, more opaque for the strongest
+    collaborations, or `neutral_color` if the countries are not on the same side (`side` is None).
+    """
+    if side == 'Western':
+        return f'rgba({COLOR_SCALE_RGB["Deep Blue"][0]}, {COLOR_SCALE_RGB["Deep Blue"][1]}, {COLOR_SCALE_RGB["Deep Blue"][2]}, {(weight / max_collaboration) * 5})'
+    elif side == 'Eastern':
+        return f'rgba({COLOR_SCALE_RGB["Deep Red"][0]}, {COLOR_SCALE_RGB["Deep Red"][1]}, {COLOR_SCALE_RGB["Deep Red"][2]}, {(weight / max_collaboration) * 5})'
+    return neutral_color
+
+def get_shared_side(side_0, side_1):
+    """
+    Returns:
+        The Cold War side of two countries if they share the Western or the Eastern side, else None
+    """
+    return side_0 if side_0 == side_1 and side_0 in ('Western', 'Eastern') else None
+
+def bucket_edges(starts, ends, weights, categories, nb_width_bins=20, max_edges=None):
+    """
+    Group the edges of a figure into buckets of the same category (color) and of close weights, so
+    that each bucket is drawn as a single trace instead of one trace per edge.
+
+    Parameters:
+        starts: The (n, 2) array of the coordinates of the first end of each edge.
+        ends: The (n, 2) array of the coordinates of the second end of each edge.
+        weights: The weight of each edge.
+        categories: The category of each edge, e.g. the side shared by its two countries.
+        nb_width_bins: The number of bins of equal width between the smallest and the largest weight,
+                       None to keep one bucket per edge.
+        max_edges: Only the heaviest edges are kept if not None.
+
+    Returns:
+        A list of tuples (category, mean weight of the bucket, xs, ys) where xs and ys hold the
+        coordinates of the edges of the bucket separated by None, in the format of a plotly line trace.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    weights = np.asarray(weights, dtype=float)
+    categories = np.asarray(categories, dtype=object)
+
+    if max_edges is not None and len(weights) > max_edges:
+        kept = np.sort(np.argsort(-weights, kind='stable')[:max_edges])
+        starts, ends, weights, categories = starts[kept], ends[kept], weights[kept], categories[kept]
+    if len(weights) == 0:
+        return []
+    if nb_width_bins is None:
+        return [
+            (category, weight, [start[0], end[0], None], [start[1], end[1], None])
+            for start, end, weight, category in zip(starts.tolist(), ends.tolist(), weights.tolist(), categories)
+        ]
+
+    bin_edges = np.linspace(weights.min(), weights.max(), nb_width_bins + 1)
+    bins = np.digitize(weights, bin_edges[1:-1])
+
+    buckets = []
+    for category in pd.unique(categories):
+        in_category = categories == category
+        for weight_bin in np.unique(bins[in_category]):
+            mask = in_category & (bins == weight_bin)
+            xs = np.full(3 * mask.sum(), None, dtype=object)
+            ys = np.full(3 * mask.sum(), None, dtype=object)
+            xs[0::3], xs[1::3] = starts[mask, 0], ends[mask, 0]
+            ys[0::3], ys[1::3] = starts[mask, 1], ends[mask, 1]
+            buckets.append((category, weights[mask].mean(), xs.tolist(), ys.tolist()))
+    return buckets
+
+def build_graph(countries, root_film_count, collaboration_count, country_cold_war_side):
+    """
+    Build the networkx co-production graph: one node per country with its side and size, one edge
+    weighted by the number of co-productions per collaboration.
+    """
+    graph = nx.Graph()
+    for country in countries:
+        graph.add_node(country, side=country_cold_war_side[country], size=root_film_count[country])
+    for (c1, c2), count in collaboration_count.items():
+        graph.add_edge(c1, c2, weight=count)
+    return graph
+
+class CollaborationIndex:
+    """
+    Full weighted co-production graph, computed once, from which the graph of any thresholds
+    (min_nb_movies, min_nb_collab) is derived without going through the movies again.
+
+    The countries are sorted by number of movies and the collaborations by number of co-productions,
+    so the nodes and edges above the thresholds are found with a binary search. The Cold War sides
+    do not depend on the thresholds and are assigned once.
+
+    Parameters:
+        movies_df: A dataframe with the `countries` and `cold_war_side` columns.
+        relevance_nb, relevance_diff, threshold: The parameters of `assign_side`.
+    """
+
+    def __init__(self, movies_df, relevance_nb=10, relevance_diff=10, threshold=19):
+        coproduction = build_coproduction_matrix(movies_df)
+        self.index_coproduction(coproduction, assign_side(movies_df, coproduction[0], relevance_nb, relevance_diff, threshold))
+
+    @classmethod
+    def from_coproduction(cls, coproduction, country_cold_war_side):
+        """
+        Build the index from a co-production matrix and the sides of its countries, computed elsewhere
+        (e.g. one frame of a `TemporalCollaborationIndex`).
+        """
+        index = cls.__new__(cls)
+        index.index_coproduction(coproduction, country_cold_war_side)
+        return index
+
+    def index_coproduction(self, coproduction, country_cold_war_side):
+        self.coproduction = coproduction
+        self.countries, matrix = coproduction
+        self.film_count = matrix.diagonal()
+        self.country_cold_war_side = country_cold_war_side
+
+        node_order = np.argsort(self.film_count, kind='stable')
+        self.sorted_nodes = node_order
+        self.sorted_film_count = self.film_count[node_order]
+
+        collaborations = sparse.triu(matrix, k=1).tocoo()
+        edge_order = np.argsort(collaborations.data, kind='stable')
+        self.edge_rows = collaborations.row[edge_order]
+        self.edge_cols = collaborations.col[edge_order]
+        self.edge_weights = collaborations.data[edge_order]
+
+    def select(self, min_nb_movies=0, min_nb_collab=0):
+        """
+        Returns:
+            A tuple (nodes, rows, cols, weights): the positions of the countries that produced more
+            than `min_nb_movies` movies in the order of their first appearance, and the endpoints and
+            weights of the collaborations between them that happened more than `min_nb_collab` times,
+            in the order of `compute_counts`.
+        """
+        kept = np.zeros(len(self.countries), dtype=bool)
+        kept[self.sorted_nodes[np.searchsorted(self.sorted_film_count, min_nb_movies, side='right'):]] = True
+
+        start = np.searchsorted(self.edge_weights, min_nb_collab, side='right')
+        rows, cols, weights = self.edge_rows[start:], self.edge_cols[start:], self.edge_weights[start:]
+        mask = kept[rows] & kept[cols]
+        rows, cols, weights = rows[mask], cols[mask], weights[mask]
+
+        order = np.lexsort((cols, rows))
+        return np.flatnonzero(kept), rows[order], cols[order], weights[order]
+
+    def counts(self, min_nb_movies=0, min_nb_collab=0):
+        """
+        Returns:
+            The same tuple (countries, root_film_count, collaboration_count) as `compute_counts`.
+        """
+        nodes, rows, cols, weights = self.select(min_nb_movies, min_nb_collab)
+        countries = [self.countries[i] for i in nodes]
+        root_film_count = {self.countries[i]: np.sqrt(self.film_count[i]) for i in nodes}
+        collaboration_count = {
+            tuple(sorted((self.countries[i], self.countries[j]))): int(weight)
+            for i, j, weight in zip(rows, cols, weights)
+        }
+        return countries, root_film_count, collaboration_count
+
+    def cold_war_side(self, countries):
+        return {country: self.country_cold_war_side[country] for country in countries}
+
+def get_rolling_frames(start=1945, end=1995, window=5, step=1):
+    """
+    Rolling windows of `window` years, every `step` years, in the format of `COLD_WAR_PERIODS`.
+
+    Returns:
+        A dict mapping a label ("1945-1949") to the first and last year of each window.
+    """
+    return {
+        f'{first}-{first + window - 1}': (first, first + window - 1)
+        for first in range(start, end - window + 2, step)
+    }
+
+def build_pair_matrix(countries, order):
+    """
+    Build the sparse movie x pair matrix of the co-productions: P[m, p] is the number of times the
+    pair of countries p appears in the movie m, the pairs (i, i) counting the movies of a country.
+
+    For any set of movies, the sum of their rows of P holds the upper triangle of the co-production
+    matrix C = MᵀM of these movies (see `build_coproduction_matrix`), so the co-productions of many
+    sets of movies are computed with a single sparse product.
+
+    Parameters:
+        countries: The `RaggedColumn` of the countries of the movies.
+        order: The vocabulary ids of the countries in the order of the rows and columns of C.
+
+    Returns:
+        A tuple (rows, cols, matrix): the positions in `order` of the two countries of each pair
+        (rows <= cols) and the `scipy.sparse.csr_matrix` P.
+    """
+    position = np.full(len(countries.vocabulary), -1, dtype=np.int64)
+    position[order] = np.arange(len(order))
+    codes = position[countries.codes]
+
+    # All the ordered pairs of values of the same movie: each value is repeated once per value of
+    # its movie and paired with them
+    value_rows = countries.row_ids()
+    nb_pairs = countries.lengths()[value_rows]
+    first = np.repeat(np.arange(len(codes)), nb_pairs)
+    shift = np.arange(len(first)) - np.repeat(np.cumsum(nb_pairs) - nb_pairs, nb_pairs)
+    second = countries.offsets[value_rows[first]] + shift
+
+    # Keep each unordered pair of countries once, and the value itself for the diagonal
+    row, col = codes[first], codes[second]
+    kept = (row < col) | (first == second)
+    row, col, movies = row[kept], col[kept], value_rows[first[kept]]
+
+    keys, pairs = np.unique(row * len(order) + col, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int64), (movies, pairs.ravel())),
+        shape=(len(countries), len(keys)),
+    )
+    return keys // len(order), keys % len(order), matrix
+
+class TemporalCollaborationIndex:
+    """
+    Co-production networks of several time frames (the Cold War periods or rolling windows),
+    computed together in one pass over the movies.
+
+    With A the sparse frame x movie matrix of the movies released in each frame and P the movie x pair
+    matrix of `build_pair_matrix`, the frame x pair matrix A @ P stacks the co-production counts of
+    all the frames. The Western, Eastern and total movies of each country are stacked the same way
+    to assign the sides of every frame at once. Each frame is then available as a
+    `CollaborationIndex`, from which the graphs of any thresholds are derived.
+
+    Parameters:
+        movies_df: A dataframe with the `countries` and `cold_war_side` columns and a column of release years.
+        frames: A dict mapping the label of each frame to its first and last year, e.g. `COLD_WAR_PERIODS`
+                or `get_rolling_frames()`. The frames may overlap.
+        relevance_nb, relevance_diff, threshold: The parameters of `assign_side`.
+        year_column: The column of the release years.
+    """
+
+    def __init__(self, movies_df, frames=COLD_WAR_PERIODS, relevance_nb=10, relevance_diff=10, threshold=19, year_column='release_date'):
+        self.frames = list(frames)
+        years = pd.to_numeric(movies_df[year_column], errors='coerce').to_numpy(dtype=float)
+        in_frame = sparse.csr_matrix(
+            np.array([(years >= start) & (years <= end) for start, end in frames.values()], dtype=np.int64).reshape(len(frames), len(years))
+        )
+
+        countries = RaggedColumn.from_series(movies_df['countries'])
+        order = countries.first_occurrences()
+        self.countries = countries.vocabulary.decode(order).tolist()
+
+        # Stacked co-production counts, one row per frame
+        self.pair_rows, self.pair_cols, pair_matrix = build_pair_matrix(countries, order)
+        self.pair_counts = (in_frame @ pair_matrix).tocsr()
+
+        # Stacked side counts, one (frame x country) matrix per column of `compute_side_counts`
+        incidence = countries.incidence_matrix()[:, order]
+        sides = movies_df['cold_war_side'].to_numpy()
+        west, east, total = [
+            (in_frame @ sparse.diags(mask, dtype=np.int64) @ incidence).toarray()
+            for mask in [sides == 'Western', sides == 'Eastern', np.ones(len(sides), dtype=bool)]
+        ]
+        self.sides = side_from_counts(west, east, total, relevance_nb, relevance_diff, threshold).reshape(west.shape)
+
+        self.indexes = {label: self.build_frame_index(position) for position, label in enumerate(self.frames)}
+
+    def build_frame_index(self, position):
+        counts = self.pair_counts[position].toarray().ravel()
+        diagonal = self.pair_rows == self.pair_cols
+        rows = np.concatenate([self.pair_rows, self.pair_cols[~diagonal]])
+        cols = np.concatenate([self.pair_cols, self.pair_rows[~diagonal]])
+        data = np.concatenate([counts, counts[~diagonal]])
+        matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(self.countries), len(self.countries)))
+        matrix.eliminate_zeros()
+        return CollaborationIndex.from_coproduction(
+            (self.countries, matrix), dict(zip(self.countries, self.sides[position]))
+        )
+
+    def __getitem__(self, label):
+        """
+        Returns:
+            The `CollaborationIndex` of a frame.
+        """
+        return self.indexes[label]
@@ -2,10 +2,36 @@ DATA_FOLDER = "data/"
 DATA_FOLDER_RAW = DATA_FOLDER + "raw/"
 DATA_FOLDER_PREPROCESSED = DATA_FOLDER + "preprocessed/"
 WEB_EXPORT_FOLDER = DATA_FOLDER + "web_export/"
+# Parquet copies of the raw files, see `src/utils/raw_data.py`
+DATA_FOLDER_CACHE = DATA_FOLDER + "cache/"
+# Results of the analyses kept between runs, apart from the raw cache cleared by `clear_raw_cache`
+ANALYSIS_CACHE = DATA_FOLDER + "cache_analysis/"
+# Layouts of the collaboration network, see `src/utils/graph_layout.py`
+LAYOUT_CACHE = ANALYSIS_CACHE + "layouts/"
+# Lemmas of the themes and character attributes, see `src/utils/text_normalization.py`
+LEMMA_CACHE = ANALYSIS_CACHE + "lemmas.json"
+# Trained LDA models, see `src/utils/topic_models.py`
+TOPIC_MODELS_FOLDER = ANALYSIS_CACHE + "topic_models/"
 
 PREPROCESSED_MOVIES = DATA_FOLDER_PREPROCESSED + "preprocessed_movies.csv"
 
 PROMPT_ENGINEERING = DATA_FOLDER_RAW + "PromptEngineering/"
+PROMPT_ENGINEERING_OUTPUTS = PROMPT_ENGINEERING + "outputs.jsonl"
+PROMPT_ENGINEERING_CACHE = PROMPT_ENGINEERING + "response_cache.jsonl.gz"
+PROMPT_FILE = "src/prompt_engineering/prompt.txt"
+# Answers of the model that could not be parsed, see `src/dataset_creation/gpt_answer_parser.py`
+GPT_PARSE_ERRORS = DATA_FOLDER_PREPROCESSED + "gpt_parse_errors.csv"
+
+# Normalization of the country and language names, see `merged_dataset_preprocessing.py`
+MAPPINGS_FOLDER = "src/dataset_creation/mappings/"
+COUNTRY_MAPPING = MAPPINGS_FOLDER + "countries.json"
+LANGUAGE_MAPPING = MAPPINGS_FOLDER + "languages.json"
+
+# Plots fetched from IMDb, see `src/dataset_creation/imdb_plots.py`
+IMDB_PLOT_CACHE = DATA_FOLDER_PREPROCESSED + "imdb_plots.sqlite"
+
+# Fingerprints of the last runs of the stages, see `src/dataset_creation/pipeline.py`
+PIPELINE_STATE = DATA_FOLDER_PREPROCESSED + "pipeline_state.json"
 
 DATA_FOLDER_CMU = DATA_FOLDER_RAW + "MovieSummaries/"
 DATA_FOLDER_TMDB = DATA_FOLDER_RAW + "TMDb/"
@@ -22,6 +48,15 @@ TMDB_KEYWORDS = DATA_FOLDER_TMDB + "keywords.csv"
 IMDB_AKA = DATA_FOLDER_IMDB + "title.akas.tsv"
 IMDB_BASIC = DATA_FOLDER_IMDB + "title.basics.tsv"
 
+# Periods of the Cold War, first and last year included
+COLD_WAR_PERIODS = {
+    'Blocs Establishment': (1947, 1953),
+    'Major tensions and crises': (1954, 1962),
+    'Détente': (1963, 1974),
+    'Second Cold War': (1975, 1984),
+    'End of the Cold War': (1985, 1991)
+}
+
 # COLOR SETS
 # Scale West to East
 COLOR_SCALE = [
@@ -0,0 +1,202 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import networkx as nx
+
+from src.utils.constants import *
+
+
+def force_directed_layout(
+    adjacency,
+    pos=None,
+    k=None,
+    iterations=50,
+    temperature=None,
+    fixed=None,
+    threshold=1e-4,
+    seed=42,
+):
+    """
+    Fruchterman-Reingold force-directed layout computed on NumPy arrays.
+
+    All the pairwise forces of an iteration are computed at once on the (n, n) arrays of the
+    distances, the same model as `nx.spring_layout` but usable with initial positions and a
+    temperature of its own to refine an existing layout.
+
+    Arguments:
+        adjacency: the (n, n) array of the edge weights
+        pos: the (n, 2) array of the initial positions, random if None
+        k: the optimal distance between the nodes, 1 / sqrt(n) if None
+        iterations: the maximum number of iterations
+        temperature: the maximum move of a node at the first iteration, decreasing linearly to 0.
+                     10% of the extent of the initial positions if None
+        fixed: the boolean array of the nodes that do not move, or None
+        threshold: the mean move of a node under which the iterations stop
+        seed: the seed of the random initial positions
+
+    Returns:
+        The (n, 2) array of the positions
+    """
+    adjacency = np.asarray(adjacency, dtype=float)
+    nb_nodes = adjacency.shape[0]
+    if pos is None:
+        pos = np.random.default_rng(seed).random((nb_nodes, 2))
+    else:
+        pos = np.array(pos, dtype=float)
+    if nb_nodes <= 1 or iterations == 0:
+        return pos
+
+    if k is None:
+        k = np.sqrt(1.0 / nb_nodes)
+    if temperature is None:
+        temperature = max(np.ptp(pos[:, 0]), np.ptp(pos[:, 1])) * 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        delta = pos[:, np.newaxis, :] - pos[np.newaxis, :, :]
+        distance = np.linalg.norm(delta, axis=-1)
+        np.clip(distance, 0.01, None, out=distance)
+
+        # Repulsion between all the nodes, attraction along the edges
+        displacement = np.einsum(
+            "ijk,ij->ik", delta, k * k / distance**2 - adjacency * distance / k
+        )
+        length = np.linalg.norm(displacement, axis=-1)
+        length = np.where(length < 0.01, 0.1, length)
+        move = displacement * (temperature / length)[:, np.newaxis]
+        if fixed is not None:
+            move[fixed] = 0.0
+
+        pos += move
+        temperature -= cooling
+        if np.linalg.norm(move) / nb_nodes < threshold:
+            break
+
+    return pos
+
+
+def rescale_layout(pos, scale=1.0):
+    """
+    Center the positions and scale them to [-scale, scale], as `nx.spring_layout` does.
+    """
+    pos = pos - pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    return pos * scale / extent if extent > 0 else pos
+
+
+def get_graph_key(graph, **params):
+    """
+    Returns:
+        The SHA-256 hash of the nodes, the weighted edges of the graph and the layout parameters
+    """
+    payload = {
+        "nodes": [str(node) for node in graph.nodes()],
+        "edges": sorted(
+            [sorted([str(u), str(v)]) + [float(weight)] for u, v, weight in graph.edges(data="weight", default=1)]
+        ),
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LayoutEngine:
+    """
+    Layout of a graph computed once and shared by the views of its subgraphs.
+
+    The layout of the full graph is computed on the first use and cached to disk, keyed by the
+    graph and the parameters. A subgraph reuses the positions of its nodes, so the nodes do not
+    jump between two views, and can optionally refine them with a few force-directed iterations
+    started from these positions.
+
+    Arguments:
+        graph: the full networkx graph, its edges weighted by their "weight" attribute
+        k: the optimal distance between the nodes
+        iterations: the number of iterations of the global layout
+        seed: the seed of the global layout
+        method: "spring" for `nx.spring_layout`, "numpy" for `force_directed_layout`
+        cache_folder: the folder of the cached layouts, None to disable the cache
+    """
+
+    def __init__(
+        self,
+        graph,
+        k=10,
+        iterations=100,
+        seed=42,
+        method="spring",
+        cache_folder=LAYOUT_CACHE,
+    ):
+        if method not in ("spring", "numpy"):
+            raise ValueError(f"Unknown layout method {method}")
+        self.graph = graph
+        self.k = k
+        self.iterations = iterations
+        self.seed = seed
+        self.method = method
+        self.cache_folder = cache_folder
+        self.positions = self.load_or_compute()
+
+    def compute(self):
+        if self.method == "spring":
+            return nx.spring_layout(
+                self.graph, seed=self.seed, weight="weight", k=self.k, iterations=self.iterations
+            )
+
+        nodes = list(self.graph.nodes())
+        adjacency = nx.to_numpy_array(self.graph, nodelist=nodes, weight="weight")
+        pos = force_directed_layout(adjacency, k=self.k, iterations=self.iterations, seed=self.seed)
+        return dict(zip(nodes, rescale_layout(pos)))
+
+    def load_or_compute(self):
+        if self.cache_folder is None:
+            return self.compute()
+
+        key = get_graph_key(
+            self.graph, k=self.k, iterations=self.iterations, seed=self.seed, method=self.method
+        )
+        path = os.path.join(self.cache_folder, key + ".json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            # The JSON keys are strings, map them back to the nodes
+            return {node: np.array(cached[str(node)]) for node in self.graph.nodes()}
+
+        positions = self.compute()
+        os.makedirs(self.cache_folder, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({str(node): list(map(float, xy)) for node, xy in positions.items()}, f)
+        os.replace(path + ".tmp", path)
+        return positions
+
+    def layout(self, subgraph, iterations=0, temperature=0.02):
+        """
+        Positions of the nodes of a subgraph of the full graph.
+
+        Arguments:
+            subgraph: a networkx graph whose nodes are nodes of the full graph
+            iterations: the number of force-directed iterations refining the global positions, 0
+                        to reuse them as they are
+            temperature: the maximum move of a node at the first refining iteration, small so the
+                         view stays close to the global layout
+
+        Returns:
+            A dict mapping each node of the subgraph to its position
+        """
+        nodes = list(subgraph.nodes())
+        missing = [node for node in nodes if node not in self.positions]
+        if missing:
+            raise ValueError(f"The nodes {missing} are not in the graph of the layout")
+        if iterations == 0:
+            return {node: self.positions[node] for node in nodes}
+
+        adjacency = nx.to_numpy_array(subgraph, nodelist=nodes, weight="weight")
+        pos = force_directed_layout(
+            adjacency,
+            pos=np.array([self.positions[node] for node in nodes]),
+            k=self.k,
+            iterations=iterations,
+            temperature=temperature,
+        )
+        return dict(zip(nodes, pos))
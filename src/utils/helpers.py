@@ -54,6 +54,142 @@ def extract_list(row, type):
         return np.nan
 
 
+def explode_list_column(series):
+    """
+    Flatten a column of lists into one value per row, ignoring the cells that are not lists.
+
+    Arguments:
+        series: a Series whose cells are lists, sets, tuples or missing values
+
+    Returns:
+        A Series of the values, indexed by the position of their row in `series`
+    """
+    is_list = series.map(type).isin([list, set, tuple])
+    exploded = series.where(is_list).reset_index(drop=True).explode()
+    # Empty lists and non-list cells give NaN when exploded
+    return exploded[exploded.notna()]
+
+
+def group_list_column(values, index):
+    """
+    Inverse of `explode_list_column`: group values indexed by row positions into a column of lists.
+
+    The duplicated values of a row are dropped and the order of first appearance is kept.
+
+    Arguments:
+        values: a Series of values indexed by the position of their row
+        index: the index of the resulting column
+
+    Returns:
+        A Series of lists with the given index, NaN for the rows without any value
+    """
+    flat = pd.DataFrame({"position": values.index, "value": values.to_numpy()})
+    flat = flat.drop_duplicates()
+
+    # Flat values + offsets representation: sort the values by row (stable to keep their order)
+    # and slice the lists between the first occurrences of each position
+    order = np.argsort(flat["position"].to_numpy(), kind="stable")
+    positions = flat["position"].to_numpy()[order]
+    flat_values = flat["value"].to_numpy()[order].tolist()
+    rows, starts = np.unique(positions, return_index=True)
+    ends = np.append(starts[1:], len(positions))
+
+    lists = np.full(len(index), np.nan, dtype=object)
+    for row, start, end in zip(rows, starts, ends):
+        lists[row] = flat_values[start:end]
+    return pd.Series(lists, index=index)
+
+
+def union_list_columns(series_1, series_2):
+    """
+    Vectorized union of two columns of lists, row by row.
+
+    Arguments:
+        series_1: a Series of lists, the cells that are not lists count as empty
+        series_2: a Series of lists with the same index
+
+    Returns:
+        A Series of lists holding the distinct values of both columns for each row (the values of
+        `series_1` first), NaN when both cells are empty
+    """
+    values = pd.concat(
+        [explode_list_column(series_1), explode_list_column(series_2)]
+    )
+    return group_list_column(values, series_1.index)
+
+
+def map_list_column(series, mapping, clean=None):
+    """
+    Vectorized normalization of the values of a column of lists through a mapping.
+
+    The column is exploded once and the cleaning and the mapping are computed once per distinct
+    value, then the values are deduplicated and regrouped by row.
+
+    Arguments:
+        series: a Series of lists, the cells that are not lists are kept as they are
+        mapping: a dict mapping raw values to their normalized value, values missing from it are
+                 kept and values mapped to None are dropped
+        clean: a function applied to the Series of the distinct values before the mapping, or None
+
+    Returns:
+        A Series of lists of the distinct normalized values of each row, a list may become empty
+    """
+    values = explode_list_column(series)
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    if clean is not None:
+        uniques = clean(uniques)
+    normalized = uniques.map(mapping).where(uniques.isin(mapping.keys()), uniques)
+
+    values = pd.Series(normalized.to_numpy()[codes], index=values.index)
+    grouped = group_list_column(values[values.notna()], series.index)
+
+    is_list = series.map(type).isin([list, set, tuple])
+    emptied = is_list & grouped.isna()
+    grouped[emptied] = pd.Series(
+        [[] for _ in range(emptied.sum())], index=grouped.index[emptied]
+    )
+    return grouped.where(is_list, series)
+
+
+# `'name': '...'` or `"name": "..."` fields of the TMDb lists of dicts, without escape sequences
+NAME_FIELD_PATTERN = re.compile(r"""['"]name['"]:\s*(?:'([^'\\]*)'|"([^"\\]*)")""")
+
+
+def decode_name_list(value):
+    """
+    Extract the names of a TMDb cell, a Python literal list of dicts with a "name" key
+    (e.g. "[{'id': 18, 'name': 'Drama'}]").
+
+    The names are extracted with a regex, `ast.literal_eval` is only used when the regex cannot
+    be trusted: escape sequences in the string or not exactly one name per dict.
+
+    Arguments:
+        value: the string to decode
+
+    Returns:
+        The list of names, or NaN if the list is empty
+    """
+    names = [single or double for single, double in NAME_FIELD_PATTERN.findall(value)]
+    if "\\" in value or len(names) != value.count("{"):
+        names = [item["name"] for item in ast.literal_eval(value)]
+    return names if names else np.nan
+
+
+def decode_name_list_column(series):
+    """
+    Decode a TMDb column with `decode_name_list`, each distinct string being decoded only once.
+
+    Arguments:
+        series: a Series of strings or missing values
+
+    Returns:
+        A Series of lists of names, NaN for the missing values and the empty lists
+    """
+    decoded = {value: decode_name_list(value) for value in series.dropna().unique()}
+    return series.map(decoded)
+
+
 def convert_to_datetime(date_str):
     """
     Convert a string representing a date into a `datetime` object.
@@ -81,6 +217,66 @@ def convert_to_datetime(date_str):
                 return None
 
 
+# Formats accepted by `convert_to_datetime`, with the pattern a string must fully match to be
+# parsed with it (`strptime` accepts one or two digits for months and days, and rejects the year 0
+# that `pd.to_datetime` accepts)
+DATE_FORMAT_PATTERNS = {
+    "%Y-%m-%d": r"(?!0000)\d{4}-\d{1,2}-\d{1,2}",
+    "%Y": r"(?!0000)\d{4}",
+    "%Y-%m": r"(?!0000)\d{4}-\d{1,2}",
+}
+
+# Resolution of the parsed dates, the nanoseconds do not hold the dates before 1677 (e.g. the
+# "1010-12-02" of the CMU metadata)
+DATE_RESOLUTION = "datetime64[us]"
+
+
+def convert_to_datetime_series(date_series):
+    """
+    Vectorized version of `convert_to_datetime` for a whole column of date strings.
+
+    Each string is classified as "%Y-%m-%d", "%Y-%m" or "%Y" with a regex mask, then every
+    group is parsed with a single `pd.to_datetime` call.
+
+    Arguments:
+        date_series: A Series of strings representing dates
+
+    Returns:
+        A `DATE_RESOLUTION` Series with the same index, with the values of
+        `pd.to_datetime(date_series.apply(convert_to_datetime), errors="coerce")`:
+        non-string values and unsupported or invalid dates are set to NaT.
+    """
+    # Only string values can be parsed, a numeric column has nothing to convert
+    if not (
+        pd.api.types.is_object_dtype(date_series)
+        or pd.api.types.is_string_dtype(date_series)
+    ):
+        return pd.Series(pd.NaT, index=date_series.index, dtype=DATE_RESOLUTION)
+
+    # Non-string values give NaN in the matches and are dropped, they stay NaT. The rows are
+    # identified by position, the index of `date_series` may have duplicates
+    remaining = date_series.reset_index(drop=True)
+    remaining = remaining[remaining.notna()]
+    parts = []
+    for date_format, pattern in DATE_FORMAT_PATTERNS.items():
+        mask = remaining.str.fullmatch(pattern).fillna(False).astype(bool)
+        if mask.any():
+            parts.append(
+                pd.to_datetime(remaining[mask], format=date_format, errors="coerce")
+            )
+        # Only try the next formats on the strings that are not classified yet
+        remaining = remaining[~mask]
+
+    if not parts:
+        return pd.Series(pd.NaT, index=date_series.index, dtype=DATE_RESOLUTION)
+
+    # Combine the parts without pre-allocating the result, then give it the same resolution
+    # whatever the dates of the column
+    parsed = pd.concat(parts).reindex(range(len(date_series))).astype(DATE_RESOLUTION)
+    parsed.index = date_series.index
+    return parsed
+
+
 def preprocess_movie_data(df_movie):
     """
     Preprocesses a DataFrame of movie data by cleaning and standardizing key columns.
@@ -102,8 +298,8 @@ def preprocess_movie_data(df_movie):
     # df_movie.loc[:, 'title'] = df_movie['title'].str.lower().str.strip()
 
     # Convert 'release_date' to datetime
-    df_movie.loc[:, 'release_date'] = pd.to_datetime(
-        df_movie['release_date'].astype(str).apply(convert_to_datetime), errors='coerce'
+    df_movie.loc[:, 'release_date'] = convert_to_datetime_series(
+        df_movie['release_date'].astype(str)
     )
 
     # Replace 0.0 with NaN in 'revenue' and 'runtime'
@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from src.utils.constants import *
+
+# Columns with few distinct values that are stored as categories in the cache
+CATEGORICAL_COLUMNS = ["region", "titleType", "language"]
+
+
+def get_source_fingerprint(path):
+    """
+    Get the fingerprint of a raw file used to know if its cache is still valid.
+
+    Arguments:
+        path: the path of the raw file
+
+    Returns:
+        A dict with the size and the modification time of the file
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_cache_path(path, read_kwargs):
+    """
+    Get the path of the Parquet cache of a raw file.
+
+    The same file read with different arguments (columns, names, ...) gets a different cache.
+
+    Arguments:
+        path: the path of the raw file
+        read_kwargs: the arguments given to `pd.read_csv`
+
+    Returns:
+        The path of the cached Parquet file
+    """
+    key = hashlib.sha1(
+        json.dumps(read_kwargs, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:12]
+    return DATA_FOLDER_CACHE + f"{os.path.basename(path)}.{key}.parquet"
+
+
+def make_arrow_compatible(df):
+    """
+    Type the columns of a freshly parsed DataFrame so it can be stored in Parquet.
+
+    - The columns listed in `CATEGORICAL_COLUMNS` are converted to categories.
+    - The object columns mixing strings and numbers (what `pd.read_csv` gives when the type
+      of a column changes between chunks) are converted to strings, missing values are kept.
+
+    Arguments:
+        df: the DataFrame to convert
+
+    Returns:
+        The converted DataFrame
+    """
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif df[column].dtype == object and pd.api.types.infer_dtype(
+            df[column], skipna=True
+        ) in ["mixed", "mixed-integer"]:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+def read_raw(path, use_cache=True, **read_kwargs):
+    """
+    Read a raw TSV/CSV file (CMU, TMDb or IMDb) through a Parquet cache.
+
+    On the first read the file is parsed with `pd.read_csv`, typed with `make_arrow_compatible`
+    and written to a compressed Parquet file in `DATA_FOLDER_CACHE`. The next reads are served
+    from this file as long as the size and the modification time of the raw file are unchanged.
+
+    Arguments:
+        path: the path of the raw file, one of the paths of `src/utils/constants.py`
+        use_cache: whether to use the cache, if False the file is always parsed
+        read_kwargs: the arguments given to `pd.read_csv` (sep, names, usecols, ...)
+
+    Returns:
+        The DataFrame of the raw file
+    """
+    if not use_cache:
+        return pd.read_csv(path, **read_kwargs)
+
+    cache_path = get_cache_path(path, read_kwargs)
+    fingerprint_path = cache_path + ".json"
+    fingerprint = get_source_fingerprint(path)
+
+    if os.path.exists(cache_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r") as f:
+            if json.load(f) == fingerprint:
+                return pd.read_parquet(cache_path)
+
+    df = make_arrow_compatible(pd.read_csv(path, **read_kwargs))
+
+    # Write to temporary files first so that an interrupted run never leaves a broken cache
+    os.makedirs(DATA_FOLDER_CACHE, exist_ok=True)
+    df.to_parquet(cache_path + ".tmp", compression="zstd", index=False)
+    os.replace(cache_path + ".tmp", cache_path)
+    with open(fingerprint_path + ".tmp", "w") as f:
+        json.dump(fingerprint, f)
+    os.replace(fingerprint_path + ".tmp", fingerprint_path)
+
+    return df
+
+
+def clear_raw_cache():
+    """
+    Remove all the cached Parquet files and their fingerprints, the other files are kept.
+    """
+    if os.path.exists(DATA_FOLDER_CACHE):
+        for file_name in os.listdir(DATA_FOLDER_CACHE):
+            if file_name.endswith((".parquet", ".parquet.json")):
+                os.remove(os.path.join(DATA_FOLDER_CACHE, file_name))
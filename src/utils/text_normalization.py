@@ -0,0 +1,105 @@
+import os
+import json
+
+from src.utils.constants import *
+from src.utils.helpers import explode_list_column
+
+# Components not needed for the lemmas, the lemmatizer only depends on the tagger
+DISABLED_COMPONENTS = ["parser", "ner"]
+
+
+def get_model_name(nlp):
+    """
+    Returns:
+        The name and version of a spaCy pipeline, e.g. "en_core_web_sm-3.7.1"
+    """
+    meta = nlp.meta
+    return f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+
+
+class TextNormalizer:
+    """
+    Lemmatization of short phrases (themes, character attributes, ...) shared by the analyses.
+
+    Each distinct phrase is processed only once: the phrases not seen yet are deduplicated and
+    lemmatized in batches with `nlp.pipe`, without the parser and the named entities, and their
+    tokens are kept in a phrase -> tokens cache. The cache is saved to disk with `save` and reused
+    by the next runs with the same spaCy model.
+
+    A token is a tuple (lemma, is_stop, is_punct), the filters of the analyses are applied on
+    these tuples so the same cache serves all of them.
+
+    Arguments:
+        nlp: the spaCy pipeline, e.g. `spacy.load("en_core_web_sm")`
+        cache_path: the JSON file of the cache, None to keep it in memory only
+        batch_size: the number of phrases per batch of `nlp.pipe`
+        n_process: the number of processes of `nlp.pipe`
+    """
+
+    def __init__(self, nlp, cache_path=LEMMA_CACHE, batch_size=1000, n_process=1):
+        self.nlp = nlp
+        self.model_name = get_model_name(nlp)
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.lemmas = self.load()
+        self.nb_new = 0
+
+    def load(self):
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return {}
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        # The lemmas of another model are not reused
+        if cached.get("model") != self.model_name:
+            return {}
+        return {
+            phrase: [tuple(token) for token in tokens]
+            for phrase, tokens in cached["lemmas"].items()
+        }
+
+    def save(self):
+        """
+        Save the cache, if it has new phrases since it was loaded.
+        """
+        if self.cache_path is None or self.nb_new == 0:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "lemmas": self.lemmas}, f, ensure_ascii=False)
+        os.replace(self.cache_path + ".tmp", self.cache_path)
+        self.nb_new = 0
+
+    def analyze(self, phrases):
+        """
+        Lemmatize the phrases missing from the cache.
+
+        Arguments:
+            phrases: an iterable of strings, possibly repeated
+        """
+        missing = list(dict.fromkeys(phrase for phrase in phrases if phrase not in self.lemmas))
+        if not missing:
+            return
+        docs = self.nlp.pipe(
+            missing,
+            batch_size=self.batch_size,
+            n_process=self.n_process,
+            disable=DISABLED_COMPONENTS,
+        )
+        for phrase, doc in zip(missing, docs):
+            self.lemmas[phrase] = [(token.lemma_, token.is_stop, token.is_punct) for token in doc]
+        self.nb_new += len(missing)
+
+    def analyze_column(self, column):
+        """
+        Lemmatize all the phrases of a column of lists at once, before processing it row by row.
+        """
+        self.analyze(explode_list_column(column))
+
+    def tokens(self, phrases):
+        """
+        Returns:
+            The tokens (lemma, is_stop, is_punct) of the phrases, one after the other
+        """
+        self.analyze(phrases)
+        return [token for phrase in phrases for token in self.lemmas[phrase]]
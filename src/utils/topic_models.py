@@ -0,0 +1,242 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from gensim import corpora
+from gensim.models import CoherenceModel, LdaModel, LdaMulticore
+
+from src.utils.constants import *
+
+
+def get_corpus_hash(texts):
+    """
+    Returns:
+        The SHA-256 hash of a tokenized corpus, an iterable of lists of tokens
+    """
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(json.dumps(list(text), ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def publish_folder(tmp_path, path, marker):
+    """
+    Move a folder written in `tmp_path` to `path`. If another process published the same folder in
+    the meantime (its `marker` file exists), the temporary folder is dropped and the other one kept.
+    """
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, marker)):
+            raise
+
+
+class TopicModelRegistry:
+    """
+    LDA models trained once and reused by the analyses (themes, character archetypes).
+
+    A model is identified by the hash of its tokenized corpus and its parameters. When it is not
+    in the registry yet, it is trained and saved with its corpus and dictionary in the native formats
+    of gensim (the model arrays are memory-mapped when it is loaded again, the corpus is a Matrix
+    Market file, empty documents included).
+
+    By default the model is trained by `LdaModel` in this process, and the seed makes the topics the
+    same from one run to the next. With several workers it is trained by `LdaMulticore`, faster but
+    not reproducible since the workers update the model in the order they finish their chunks: the
+    number of workers is then part of the key, so these models never replace the default ones.
+
+    Arguments:
+        folder: the folder of the saved models
+        workers: the number of worker processes of `LdaMulticore`, None or 1 to train with `LdaModel`
+    """
+
+    def __init__(self, folder=TOPIC_MODELS_FOLDER, workers=None):
+        self.folder = folder
+        self.workers = workers
+
+    def is_multicore(self):
+        return self.workers is not None and self.workers > 1
+
+    def get_path(self, corpus_hash, num_topics, passes, seed):
+        name = f"{corpus_hash[:16]}_{num_topics}topics_{passes}passes_{seed}seed"
+        if self.is_multicore():
+            name += f"_{self.workers}workers"
+        return os.path.join(self.folder, name)
+
+    def load(self, path):
+        lda_model = LdaModel.load(os.path.join(path, "lda.model"), mmap="r")
+        corpus = corpora.MmCorpus(os.path.join(path, "corpus.mm"))
+        dictionary = corpora.Dictionary.load(os.path.join(path, "dictionary.dict"))
+        return lda_model, corpus, dictionary
+
+    def train(self, texts, num_topics, passes, seed, path):
+        dictionary = corpora.Dictionary(texts)
+        corpus = [dictionary.doc2bow(text) for text in texts]
+        if self.is_multicore():
+            lda_model = LdaMulticore(
+                corpus,
+                num_topics=num_topics,
+                id2word=dictionary,
+                passes=passes,
+                random_state=seed,
+                workers=self.workers,
+            )
+        else:
+            lda_model = LdaModel(
+                corpus, num_topics=num_topics, id2word=dictionary, passes=passes, random_state=seed
+            )
+
+        # Save in a temporary folder of its own, an interrupted training leaves no model behind and
+        # two processes training the same model do not write in the same files
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=os.path.basename(path) + ".", dir=self.folder)
+        lda_model.save(os.path.join(tmp_path, "lda.model"))
+        corpora.MmCorpus.serialize(os.path.join(tmp_path, "corpus.mm"), corpus)
+        dictionary.save(os.path.join(tmp_path, "dictionary.dict"))
+        publish_folder(tmp_path, path, "lda.model")
+
+    def get(self, texts, num_topics, passes, seed=42):
+        """
+        Get the LDA model of a corpus, trained if it is not in the registry.
+
+        Arguments:
+            texts: the tokenized documents, an iterable of lists of tokens
+            num_topics: the number of topics
+            passes: the number of passes over the corpus
+            seed: the random state of the training
+
+        Returns:
+            A tuple (lda_model, corpus, dictionary), the corpus being the bag of words of the texts
+        """
+        texts = [list(text) for text in texts]
+        path = self.get_path(get_corpus_hash(texts), num_topics, passes, seed)
+        if not os.path.exists(os.path.join(path, "lda.model")):
+            self.train(texts, num_topics, passes, seed, path)
+        return self.load(path)
+
+
+def save_corpus(texts, path):
+    """
+    Save a tokenized corpus with its dictionary and bag of words in `path`, once per corpus.
+    """
+    if os.path.exists(os.path.join(path, "texts.json")):
+        return
+    dictionary = corpora.Dictionary(texts)
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=os.path.basename(path) + ".", dir=folder)
+    dictionary.save(os.path.join(tmp_path, "dictionary.dict"))
+    corpora.MmCorpus.serialize(
+        os.path.join(tmp_path, "corpus.mm"), (dictionary.doc2bow(text) for text in texts)
+    )
+    with open(os.path.join(tmp_path, "texts.json"), "w", encoding="utf-8") as f:
+        json.dump(texts, f, ensure_ascii=False)
+    publish_folder(tmp_path, path, "texts.json")
+
+
+# Corpus of the sweep, loaded once by each worker of the pool (see `init_sweep_worker`)
+SWEEP_CORPUS = {}
+
+
+def init_sweep_worker(path):
+    """
+    Load the corpus saved by `save_corpus` in a worker of the sweep, before its first model.
+    """
+    SWEEP_CORPUS["dictionary"] = corpora.Dictionary.load(os.path.join(path, "dictionary.dict"))
+    SWEEP_CORPUS["corpus"] = list(corpora.MmCorpus(os.path.join(path, "corpus.mm")))
+    with open(os.path.join(path, "texts.json"), "r", encoding="utf-8") as f:
+        SWEEP_CORPUS["texts"] = json.load(f)
+
+
+def evaluate_topic_model(num_topics, passes, alpha, seed, measures):
+    """
+    Train an LDA model on the corpus of the worker and compute its coherence.
+
+    Returns:
+        A dict of the parameters and of the coherence of each measure
+    """
+    dictionary, corpus, texts = (
+        SWEEP_CORPUS["dictionary"],
+        SWEEP_CORPUS["corpus"],
+        SWEEP_CORPUS["texts"],
+    )
+    lda_model = LdaModel(
+        corpus,
+        num_topics=num_topics,
+        id2word=dictionary,
+        passes=passes,
+        alpha=alpha,
+        random_state=seed,
+    )
+
+    scores = {"num_topics": num_topics, "passes": passes, "alpha": alpha}
+    for measure in measures:
+        # One process per model already, the coherence is computed in the worker
+        scores[measure] = CoherenceModel(
+            model=lda_model,
+            texts=texts,
+            corpus=corpus,
+            dictionary=dictionary,
+            coherence=measure,
+            processes=1,
+        ).get_coherence()
+    return scores
+
+
+def sweep_topic_models(
+    texts,
+    num_topics=range(2, 11),
+    passes=(15,),
+    alphas=("symmetric", "asymmetric"),
+    measures=("c_v", "u_mass"),
+    seed=42,
+    processes=None,
+    folder=TOPIC_MODELS_FOLDER,
+):
+    """
+    Train LDA models over a grid of parameters in a process pool and rank them by coherence.
+
+    The corpus is tokenized and saved once (dictionary, Matrix Market bag of words and texts), each
+    worker loads it once when it starts and trains all its models on it, instead of receiving the
+    corpus with every model.
+
+    Arguments:
+        texts: the tokenized documents, an iterable of lists of tokens
+        num_topics: the numbers of topics to try
+        passes: the numbers of passes to try
+        alphas: the priors of the topic distributions to try, see `LdaModel`
+        measures: the coherence measures to compute, the models are ranked by the first one
+                  ("c_v" and "u_mass" are both better when higher)
+        seed: the random state of the models
+        processes: the number of worker processes, the number of cores if None
+        folder: the folder of the saved corpus
+
+    Returns:
+        A DataFrame with one row per model, best first (ties keep the order of the grid): its
+        parameters and its coherence
+    """
+    texts = [list(text) for text in texts]
+    path = os.path.join(folder, "corpus_" + get_corpus_hash(texts)[:16])
+    save_corpus(texts, path)
+
+    grid = list(itertools.product(num_topics, passes, alphas))
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=init_sweep_worker, initargs=(path,)
+    ) as executor:
+        futures = [
+            executor.submit(evaluate_topic_model, nb_topics, nb_passes, alpha, seed, measures)
+            for nb_topics, nb_passes, alpha in grid
+        ]
+        results = pd.DataFrame([future.result() for future in futures])
+
+    # A coherence can be NaN (e.g. a topic whose words never appear together), these models come last
+    return results.sort_values(
+        measures[0], ascending=False, kind="stable", na_position="last"
+    ).reset_index(drop=True)
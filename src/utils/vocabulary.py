@@ -0,0 +1,281 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.utils.helpers import explode_list_column
+
+
+class Vocabulary:
+    """
+    Integer ids of the distinct values of a column (countries, languages, genres, ...).
+
+    The ids of a vocabulary built from scratch follow the sorted order of the values, so the same
+    data always gives the same ids. Values added later with `extend` get the next free ids and the
+    existing ids never change, a vocabulary saved with `save` keeps them across runs.
+
+    Arguments:
+        terms: the values, in the order of their ids
+    """
+
+    def __init__(self, terms=()):
+        self.terms = list(terms)
+        self.ids = {term: id for id, term in enumerate(self.terms)}
+        if len(self.ids) != len(self.terms):
+            raise ValueError("The terms of a vocabulary must be distinct")
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.ids
+
+    def __getitem__(self, id):
+        return self.terms[id]
+
+    def __repr__(self):
+        return f"Vocabulary({len(self)} terms)"
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Build the vocabulary of a Series (or any iterable) of values, missing values are ignored.
+        """
+        values = pd.Series(values, dtype=object).dropna().unique()
+        return cls(sorted(values, key=str))
+
+    @classmethod
+    def from_list_columns(cls, *columns):
+        """
+        Build the vocabulary of the values of one or several columns of lists.
+        """
+        return cls.from_values(
+            pd.concat([explode_list_column(column) for column in columns])
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.terms, f, ensure_ascii=False, indent=1)
+
+    def extend(self, values):
+        """
+        Add the unknown values of a Series (or any iterable), in sorted order after the known ones.
+        """
+        new_terms = [
+            term
+            for term in Vocabulary.from_values(values).terms
+            if term not in self.ids
+        ]
+        for term in new_terms:
+            self.ids[term] = len(self.terms)
+            self.terms.append(term)
+
+    def encode(self, values):
+        """
+        Returns:
+            The int32 array of the ids of the values, -1 for the unknown and missing values
+        """
+        return pd.Categorical(
+            pd.Series(values, dtype=object), categories=self.terms
+        ).codes.astype(np.int32)
+
+    def decode(self, ids):
+        """
+        Returns:
+            The object array of the values of the ids, NaN for -1
+        """
+        terms = np.array(self.terms + [np.nan], dtype=object)
+        return terms[np.asarray(ids)]
+
+
+class RaggedColumn:
+    """
+    Column of lists stored as a flat int32 array of vocabulary ids and an array of offsets: the
+    list of row `i` is `codes[offsets[i]:offsets[i + 1]]`.
+
+    The cells that are not lists (missing values) are stored as empty lists and flagged in
+    `is_list`. Compared to a column of Python lists of strings, the storage is a few bytes per
+    value and the counts are computed with `np.bincount` instead of Python loops.
+
+    Arguments:
+        codes: the ids of the values, row after row
+        offsets: the start of each row in `codes`, followed by the length of `codes`
+        vocabulary: the `Vocabulary` of the ids
+        is_list: the boolean array of the rows that hold a list
+        index: the index of the rows
+    """
+
+    def __init__(self, codes, offsets, vocabulary, is_list=None, index=None):
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.vocabulary = vocabulary
+        nb_rows = len(self.offsets) - 1
+        self.is_list = (
+            np.ones(nb_rows, dtype=bool) if is_list is None else np.asarray(is_list)
+        )
+        self.index = pd.RangeIndex(nb_rows) if index is None else index
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_series(cls, series, vocabulary=None):
+        """
+        Encode a column of lists.
+
+        Arguments:
+            series: a Series of lists, the other cells count as missing
+            vocabulary: the `Vocabulary` to use, it is extended with the unknown values. A new one
+                        is built from the column if None.
+        """
+        values = explode_list_column(series)
+        if vocabulary is None:
+            vocabulary = Vocabulary.from_values(values)
+        else:
+            vocabulary.extend(values)
+
+        lengths = np.bincount(values.index.to_numpy(dtype=np.int64), minlength=len(series))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        is_list = series.map(type).isin([list, set, tuple]).to_numpy()
+        return cls(vocabulary.encode(values), offsets, vocabulary, is_list, series.index)
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def row_ids(self):
+        """
+        Returns:
+            The position of the row of each value of `codes`
+        """
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def to_series(self):
+        """
+        Decode the column back to a Series of lists, NaN for the rows that were missing.
+        """
+        terms = self.vocabulary.decode(self.codes).tolist()
+        lists = np.full(len(self), np.nan, dtype=object)
+        for row in np.flatnonzero(self.is_list):
+            lists[row] = terms[self.offsets[row] : self.offsets[row + 1]]
+        return pd.Series(lists, index=self.index)
+
+    def count(self, rows=None):
+        """
+        Count the occurrences of each value.
+
+        Arguments:
+            rows: a boolean mask of the rows to count, all of them if None
+
+        Returns:
+            The int64 array of the counts, indexed by vocabulary id
+        """
+        codes = self.codes if rows is None else self.codes[np.asarray(rows)[self.row_ids()]]
+        return np.bincount(codes, minlength=len(self.vocabulary))
+
+    def count_by(self, groups, nb_groups):
+        """
+        Count the occurrences of each value within groups of rows.
+
+        Arguments:
+            groups: the int array of the group of each row, -1 to ignore a row
+            nb_groups: the number of groups
+
+        Returns:
+            The int64 array of shape (nb_groups, vocabulary size) of the counts
+        """
+        nb_terms = len(self.vocabulary)
+        value_groups = np.asarray(groups, dtype=np.int64)[self.row_ids()]
+        kept = value_groups >= 0
+        counts = np.bincount(
+            value_groups[kept] * nb_terms + self.codes[kept],
+            minlength=nb_groups * nb_terms,
+        )
+        return counts.reshape(nb_groups, nb_terms)
+
+    def first_occurrences(self):
+        """
+        Returns:
+            The ids of the values in the order of their first occurrence in the column
+        """
+        return first_occurrences(self.codes)
+
+    def incidence_matrix(self, binary=True):
+        """
+        Sparse row x value incidence matrix of the column, the inverted index of a value being the
+        non-zero rows of its column.
+
+        Arguments:
+            binary: whether a value listed several times in a row counts once, otherwise the
+                    entries are the number of occurrences
+
+        Returns:
+            A `scipy.sparse.csr_matrix` of shape (number of rows, vocabulary size)
+        """
+        from scipy.sparse import csr_matrix
+
+        matrix = csr_matrix(
+            (np.ones(len(self.codes), dtype=np.int64), self.codes, self.offsets),
+            shape=(len(self), len(self.vocabulary)),
+        )
+        matrix.sum_duplicates()
+        if binary:
+            matrix.data[:] = 1
+        return matrix
+
+
+def first_occurrences(codes):
+    """
+    Returns:
+        The distinct ids of `codes` (-1 excluded) in the order of their first occurrence
+    """
+    codes = np.asarray(codes)
+    ids, first = np.unique(codes, return_index=True)
+    order = np.argsort(first, kind="stable")
+    return ids[order][ids[order] >= 0]
+
+
+def encode_list_columns(df, columns=("countries", "languages", "genres"), vocabularies=None):
+    """
+    Encode the list columns of a DataFrame.
+
+    Arguments:
+        df: the DataFrame
+        columns: the names of the list columns
+        vocabularies: a dict mapping column names to the `Vocabulary` to use (extended with the
+                      unknown values), the missing ones are built from the columns
+
+    Returns:
+        A dict mapping each column name to its `RaggedColumn`
+    """
+    vocabularies = vocabularies or {}
+    return {
+        column: RaggedColumn.from_series(df[column], vocabularies.get(column))
+        for column in columns
+    }
+
+
+def counts_to_frame(vocabulary, counts, ids, name_column, count_column):
+    """
+    Build a DataFrame of counts sorted in decreasing order, the ties keep the order of `ids`.
+
+    Arguments:
+        vocabulary: the `Vocabulary` of the ids
+        counts: the counts indexed by vocabulary id
+        ids: the ids to keep, e.g. `RaggedColumn.first_occurrences()`
+        name_column: the name of the column of the values
+        count_column: the name of the column of the counts
+
+    Returns:
+        A DataFrame with the columns `name_column` and `count_column`, without the zero counts
+    """
+    ids = np.asarray(ids)
+    ids = ids[counts[ids] > 0]
+    ids = ids[np.argsort(-counts[ids], kind="stable")]
+    return pd.DataFrame(
+        {name_column: vocabulary.decode(ids), count_column: counts[ids]}
+    )